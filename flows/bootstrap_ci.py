@@ -0,0 +1,99 @@
+# ---------------------------------------------------------------
+# * Copyright (c) 2018
+# * Broadcom Corporation
+# * All Rights Reserved.
+# *---------------------------------------------------------------
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.  Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the documentation and/or other
+# materials provided with the distribution.  Neither the name of the Broadcom nor the names of
+# contributors may be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Vectorized bootstrap confidence intervals for flow metrics and histograms
+#
+# Date October 2026
+
+import logging
+import os
+import collections
+import concurrent.futures
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# A bootstrap resample of N values from an empirical distribution is a multinomial draw of N over its
+# distinct values, so the data is reduced to (values, counts) once and each resample is a row of counts
+# instead of N indices. That makes a resample O(distinct values), i.e. O(bins) for a histogram, no matter
+# how many samples there are. Resamples are drawn as count matrices in chunks sized to a memory budget,
+# chunks are spread over a process pool with independent seeds from one SeedSequence.
+CHUNK_BYTES = 64 * 1024 * 1024
+PARALLEL_MIN_RESAMPLES = 2000
+
+confidence_interval = collections.namedtuple('confidence_interval', ['estimate', 'low', 'high', 'confidence', 'statistic', 'n_resamples'])
+
+def _statistic(values, counts, statistic) :
+    # statistic of each row of a counts matrix over the sorted distinct values
+    counts = np.atleast_2d(counts)
+    n = counts[0].sum()
+    if statistic == 'mean' :
+        return counts @ values / float(n)
+    if statistic == 'median' :
+        statistic = 50.0
+    # inverted cdf percentile, the first value where the cumulative count reaches the target
+    cumulative = np.cumsum(counts, axis=1)
+    target = float(statistic) / 100.0 * n
+    ix = np.minimum((cumulative < target).sum(axis=1), len(values) - 1)
+    return values[ix]
+
+def _resample_chunk(values, probabilities, n, size, statistic, seed) :
+    rng = np.random.default_rng(seed)
+    return _statistic(values, rng.multinomial(n, probabilities, size=size), statistic)
+
+def bootstrap(values, counts=None, statistic='mean', n_resamples=10000, confidence=0.95, workers=None, seed=None) :
+    # statistic is 'mean', 'median' or a percentile, e.g. 99 or 99.9
+    if counts is None :
+        values, counts = np.unique(np.asarray(values, dtype=np.float64), return_counts=True)
+    else :
+        order = np.argsort(values)
+        values = np.asarray(values, dtype=np.float64)[order]
+        counts = np.asarray(counts, dtype=np.int64)[order]
+    n = int(counts.sum())
+    probabilities = counts / float(n)
+    estimate = float(_statistic(values, counts, statistic)[0])
+
+    chunk = max(1, min(n_resamples, CHUNK_BYTES // (8 * len(values))))
+    sizes = [min(chunk, n_resamples - start) for start in range(0, n_resamples, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers is None :
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(sizes) == 1 or n_resamples < PARALLEL_MIN_RESAMPLES :
+        results = [_resample_chunk(values, probabilities, n, size, statistic, s) for size, s in zip(sizes, seeds)]
+    else :
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(sizes))) as pool :
+            results = list(pool.map(_resample_chunk, *zip(*[(values, probabilities, n, size, statistic, s) for size, s in zip(sizes, seeds)])))
+    replicates = np.concatenate(results)
+    alpha = (1.0 - confidence) / 2.0
+    low, high = np.quantile(replicates, [alpha, 1.0 - alpha])
+    logging.debug('bootstrap {} of {} samples ({} distinct) in {} chunks'.format(statistic, n, len(values), len(sizes)))
+    return confidence_interval(estimate, float(low), float(high), confidence, statistic, n_resamples)
+
+def histogram_ci(h, statistic='mean', **kwargs) :
+    # values in us, a flow_histogram bin ix is reported at ix * binwidth
+    return bootstrap(h.bins * h.binwidth, counts=h.counts, statistic=statistic, **kwargs)
+
+def flowstats_ci(flow, column, statistic='mean', **kwargs) :
+    # any of the per interval flowstats lists, e.g. rxthroughput or connect_time
+    return bootstrap(np.asarray(flow.flowstats[column], dtype=np.float64), statistic=statistic, **kwargs)
@@ -0,0 +1,234 @@
+# ---------------------------------------------------------------
+# * Copyright (c) 2018
+# * Broadcom Corporation
+# * All Rights Reserved.
+# *---------------------------------------------------------------
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.  Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the documentation and/or other
+# materials provided with the distribution.  Neither the name of the Broadcom nor the names of
+# contributors may be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# Bounded console capture, an in memory ring of recent lines spilling to rotating compressed files with a time index
+#
+# Date October 2026
+
+import logging
+import os
+import gzip
+import time
+import bisect
+import collections
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Console lines are stamped with the time.time() of the read that completed them and kept in a ring
+# of at most ring_bytes. When the ring is full its older half is written out as one gzip member
+# appended to the current spill file, <name>.<n>.log.gz, and an index line
+#
+#   first_time last_time filename offset length
+#
+# is appended to <name>.index. Spill files rotate at spill_bytes and only the newest max_files are
+# kept. A member holds "time line" text so zcat of a spill file reads as a time stamped log, while
+# the index (sorted since times don't go back) lets window(start, end) bisect to the few members
+# that overlap and decompress only those. Without a directory nothing is spilled, the evicted
+# lines are dropped and counted, so memory stays bounded either way.
+
+def _epoch(t) :
+    if isinstance(t, datetime) :
+        return t.timestamp()
+    return None if t is None else float(t)
+
+def _decode(block) :
+    lines = []
+    for row in block.split(b'\n') :
+        if row :
+            t, _, line = row.partition(b' ')
+            lines.append((float(t), line))
+    return lines
+
+def _select(index, firsts, start, end) :
+    # index rows overlapping [start, end], firsts is the sorted first times of the rows so both ends
+    # are bisects, a row before the one holding start ended before it since times don't go back
+    lo = max(bisect.bisect_right(firsts, start) - 1, 0) if start is not None else 0
+    hi = bisect.bisect_right(firsts, end) if end is not None else len(index)
+    return [index[ix] for ix in range(lo, hi) if start is None or index[ix][1] >= start]
+
+def _read(directory, rows, start, end) :
+    lines = []
+    for first, last, filename, offset, length in rows :
+        path = os.path.join(directory, filename)
+        try :
+            with open(path, 'rb') as fid :
+                fid.seek(offset)
+                block = gzip.decompress(fid.read(length))
+        except (OSError, EOFError) as err :
+            logging.warning('console spill {} unreadable: {}'.format(path, err))
+            continue
+        lines.extend([(t, line) for t, line in _decode(block) if (start is None or t >= start) and (end is None or t <= end)])
+    return lines
+
+def read_index(filename) :
+    index = []
+    with open(filename, 'r') as fid :
+        for row in fid :
+            fields = row.split()
+            if len(fields) == 5 :
+                index.append((float(fields[0]), float(fields[1]), fields[2], int(fields[3]), int(fields[4])))
+    return index
+
+def window(indexfile, start=None, end=None) :
+    # offline extraction from a capture's index file, returns [(time, line bytes), ...]
+    start, end = _epoch(start), _epoch(end)
+    index = read_index(indexfile)
+    return _read(os.path.dirname(indexfile), _select(index, [row[0] for row in index], start, end), start, end)
+
+class console_capture(object) :
+    RING_BYTES = 1 << 20
+    SPILL_BYTES = 16 << 20
+    MAX_FILES = 8
+
+    def __init__(self, name='console', directory=None, ring_bytes=None, spill_bytes=None, max_files=None) :
+        self.name = name
+        self.directory = directory
+        self.ring_bytes = ring_bytes or console_capture.RING_BYTES
+        self.spill_bytes = spill_bytes or console_capture.SPILL_BYTES
+        self.max_files = max_files or console_capture.MAX_FILES
+        self.max_line = max(self.ring_bytes // 4, 1)
+        self._times = []
+        self._lines = []
+        self._size = 0
+        self._partial = b''
+        self._partial_time = None
+        self.index = []
+        self._firsts = []
+        # the live spill files, oldest first, and the number of the next one
+        self.files = collections.deque()
+        self._filenumber = 0
+        self.dropped = 0
+        self.spilled = 0
+        self._fid = None
+        self.indexfile = None
+        if directory :
+            os.makedirs(directory, exist_ok=True)
+            self.indexfile = os.path.join(directory, '{}.index'.format(name))
+            open(self.indexfile, 'w').close()
+
+    def __len__(self) :
+        return len(self._lines)
+
+    def write(self, data, t=None) :
+        t = time.time() if t is None else t
+        rows = (self._partial + bytes(data)).split(b'\n')
+        self._partial = rows.pop()
+        for line in rows :
+            self._append(t, line.rstrip(b'\r'))
+        # a console that never prints a newline mustn't grow past the ring, the line is cut in pieces
+        while len(self._partial) >= self.max_line :
+            self._append(t, self._partial[:self.max_line])
+            self._partial = self._partial[self.max_line:]
+        self._partial_time = t if self._partial else None
+
+    def _append(self, t, line) :
+        self._times.append(t)
+        self._lines.append(line)
+        self._size += len(line) + 1
+        if self._size > self.ring_bytes :
+            self._evict(self._size - self.ring_bytes // 2)
+
+    def _evict(self, nbytes) :
+        count = 0
+        freed = 0
+        while count < len(self._lines) and freed < nbytes :
+            freed += len(self._lines[count]) + 1
+            count += 1
+        if self.directory :
+            self._spill(self._times[:count], self._lines[:count])
+        else :
+            self.dropped += count
+        del self._times[:count]
+        del self._lines[:count]
+        self._size -= freed
+
+    def _spill(self, times, lines) :
+        if not times :
+            return
+        if self._fid is None or self._fid.tell() >= self.spill_bytes :
+            self._rotate()
+        block = gzip.compress(b''.join([b'%.6f %s\n' % (t, line) for t, line in zip(times, lines)]))
+        offset = self._fid.tell()
+        self._fid.write(block)
+        self._fid.flush()
+        row = (times[0], times[-1], self.files[-1], offset, len(block))
+        self.index.append(row)
+        self._firsts.append(row[0])
+        with open(self.indexfile, 'a') as fid :
+            fid.write('{:.6f} {:.6f} {} {} {}\n'.format(*row))
+        self.spilled += len(lines)
+
+    def _rotate(self) :
+        if self._fid :
+            self._fid.close()
+        filename = '{}.{}.log.gz'.format(self.name, self._filenumber)
+        self._filenumber += 1
+        self.files.append(filename)
+        self._fid = open(os.path.join(self.directory, filename), 'wb')
+        while len(self.files) > self.max_files :
+            oldest = self.files.popleft()
+            # the oldest file's rows are the head of the index
+            count = 0
+            while count < len(self.index) and self.index[count][2] == oldest :
+                count += 1
+            del self.index[:count]
+            del self._firsts[:count]
+            try :
+                os.remove(os.path.join(self.directory, oldest))
+            except OSError :
+                pass
+            with open(self.indexfile, 'w') as fid :
+                for row in self.index :
+                    fid.write('{:.6f} {:.6f} {} {} {}\n'.format(*row))
+
+    def window(self, start=None, end=None) :
+        # [(time, line bytes), ...] captured in [start, end], start and end are time.time() values or datetimes
+        start, end = _epoch(start), _epoch(end)
+        lines = _read(self.directory, _select(self.index, self._firsts, start, end), start, end) if self.directory else []
+        lo = bisect.bisect_left(self._times, start) if start is not None else 0
+        hi = bisect.bisect_right(self._times, end) if end is not None else len(self._times)
+        lines.extend(zip(self._times[lo:hi], self._lines[lo:hi]))
+        return lines
+
+    def text(self, start=None, end=None) :
+        return '\n'.join([line.decode('utf-8', errors='replace') for t, line in self.window(start, end)])
+
+    @property
+    def tail(self) :
+        # the ring as the bytes that were read, i.e. what session.results used to hold
+        rows = self._lines + ([self._partial] if self._partial else [])
+        return b'\n'.join(rows) + (b'\n' if self._lines and not self._partial else b'')
+
+    def close(self) :
+        if self._partial :
+            self._append(self._partial_time, self._partial.rstrip(b'\r'))
+            self._partial = b''
+            self._partial_time = None
+        if self.directory :
+            self._evict(self._size)
+        if self._fid :
+            self._fid.close()
+            self._fid = None
@@ -0,0 +1,145 @@
+# ---------------------------------------------------------------
+# * Copyright (c) 2018
+# * Broadcom Corporation
+# * All Rights Reserved.
+# *---------------------------------------------------------------
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.  Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the documentation and/or other
+# materials provided with the distribution.  Neither the name of the Broadcom nor the names of
+# contributors may be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# Shared deadline scheduler for the connect, command and io watchdogs of ssh sessions and iperf protocols
+#
+# Date October 2026
+
+import logging
+import heapq
+import weakref
+
+logger = logging.getLogger(__name__)
+
+# A watchdog is a deadline entry holding its timeout and the loop time of the last activity. Activity,
+# e.g. every pipe_data_received chunk, only stores the time in touch(), no timer handle is cancelled
+# or re-armed. Entries sit in one heap per loop keyed by the deadline they had when pushed, and one
+# coarse tick every resolution seconds pops the entries that look due. An entry touched since it was
+# pushed is pushed back with its new deadline, so heap work is at most one push per timeout period
+# per entry however chatty the session is, and a timeout fires at most resolution seconds late.
+# The tick is only armed for the earliest deadline in the heap, so idle watchdogs cost no wakeups.
+# Each push bumps the entry's generation and the heap item carries it, so when a cancelled entry is
+# touched and pushed again while its old item is still queued, the old item is stale and skipped.
+
+class deadline(object) :
+    __slots__ = ('scheduler', 'callback', 'timeout', 'last', 'active', 'generation', '__weakref__')
+
+    def __init__(self, scheduler, callback, timeout) :
+        self.scheduler = scheduler
+        self.callback = callback
+        self.timeout = float(timeout)
+        self.last = scheduler.loop.time()
+        self.active = True
+        self.generation = 0
+
+    @property
+    def expires(self) :
+        return self.last + self.timeout
+
+    def touch(self) :
+        # activity, a cancelled entry is re-armed, like re-arming a cancelled call_later watchdog
+        self.last = self.scheduler.loop.time()
+        if not self.active :
+            self.active = True
+            self.scheduler._push(self)
+
+    def cancel(self) :
+        self.active = False
+
+class deadline_scheduler(object) :
+    RESOLUTION = 0.1
+
+    def __init__(self, loop, resolution=None) :
+        self.loop = loop
+        self.resolution = resolution or deadline_scheduler.RESOLUTION
+        self._heap = []
+        self._sequence = 0
+        self._handle = None
+
+    def __len__(self) :
+        return len([item for item in self._heap if self._live(item)])
+
+    def watch(self, callback, timeout) :
+        # callback() is called once timeout seconds pass without a touch() of the returned entry
+        entry = deadline(self, callback, timeout)
+        self._push(entry)
+        return entry
+
+    def _push(self, entry, arm=True) :
+        entry.generation += 1
+        self._sequence += 1
+        heapq.heappush(self._heap, (entry.expires, self._sequence, entry.generation, entry))
+        if arm :
+            self._arm()
+
+    @staticmethod
+    def _live(item) :
+        # an active entry's latest heap item, not one left behind by a cancel and re-arm
+        _, _, generation, entry = item
+        return entry.active and generation == entry.generation
+
+    def _arm(self) :
+        # tick no sooner than resolution from now and no later than the earliest heap deadline
+        when = max(self.loop.time() + self.resolution, self._heap[0][0])
+        if self._handle is not None :
+            if self._handle.when() <= when :
+                return
+            self._handle.cancel()
+        self._handle = self.loop.call_at(when, self._tick)
+
+    def _tick(self) :
+        self._handle = None
+        now = self.loop.time()
+        expired = []
+        while self._heap and self._heap[0][0] <= now :
+            item = heapq.heappop(self._heap)
+            if not self._live(item) :
+                continue
+            entry = item[3]
+            if entry.expires > now :
+                self._push(entry, arm=False)
+            else :
+                entry.active = False
+                expired.append(entry)
+        for entry in expired :
+            try :
+                entry.callback()
+            except Exception as err :
+                logging.error('deadline callback {} failed: {}'.format(entry.callback, err))
+        # drop the cancelled and stale items left at the top so an idle scheduler stops ticking
+        while self._heap and not self._live(self._heap[0]) :
+            heapq.heappop(self._heap)
+        if self._heap :
+            self._arm()
+
+_schedulers = weakref.WeakKeyDictionary()
+
+def shared(loop) :
+    # the one scheduler per event loop, shared by ssh_session and the iperf protocols
+    scheduler = _schedulers.get(loop)
+    if scheduler is None :
+        scheduler = deadline_scheduler(loop)
+        _schedulers[loop] = scheduler
+    return scheduler
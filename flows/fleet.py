@@ -0,0 +1,151 @@
+# ---------------------------------------------------------------
+# * Copyright (c) 2018
+# * Broadcom Corporation
+# * All Rights Reserved.
+# *---------------------------------------------------------------
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.  Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the documentation and/or other
+# materials provided with the distribution.  Neither the name of the Broadcom nor the names of
+# contributors may be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# Fan out of one command across a fleet of ssh_nodes with bounded concurrency, per host connection rates and retries
+#
+# Date October 2026
+
+import logging
+import asyncio
+import collections
+import csv
+import random
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# Every node runs the command in its own ssh session, at most concurrency sessions at a time so
+# local fds and processes stay bounded. Before connecting, a session takes a token from the bucket
+# of the ssh endpoint it connects to, the node or its relay, refilled at rate per second up to
+# burst, which keeps new connections under sshd's MaxStartups throttling. A session failing with
+# ssh's exit code 255 and a connect error in its output is retried after an exponential backoff
+# with jitter, up to retries times. The command is a str.format template over the node, e.g.
+# 'wl -i {node.device} status', or a callable taking the node. Rows come back in node order.
+
+fleet_row = collections.namedtuple('fleet_row', ['node', 'cmd', 'returncode', 'elapsed', 'attempts', 'stdout', 'stderr', 'error'])
+
+TRANSIENT = re.compile(r'Connection (refused|reset|timed out|closed)|kex_exchange_identification|ssh_exchange_identification|No route to host|Resource temporarily unavailable|Too many', re.IGNORECASE)
+
+class token_bucket(object) :
+    def __init__(self, rate, burst) :
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) :
+        # waiters are served in order, each sleeps until a token has refilled
+        async with self._lock :
+            while True :
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1 :
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class fleet_results(list) :
+    # the result table, one fleet_row per node
+
+    def failed(self) :
+        return fleet_results([row for row in self if row.returncode != 0])
+
+    def succeeded(self) :
+        return fleet_results([row for row in self if row.returncode == 0])
+
+    def by_returncode(self) :
+        groups = collections.defaultdict(list)
+        for row in self :
+            groups[row.returncode].append(row.node)
+        return dict(groups)
+
+    def outputs(self) :
+        # {node name : stdout text}
+        return {row.node : row.stdout for row in self}
+
+    def write_csv(self, filename) :
+        with open(filename, 'w', newline='') as fid :
+            writer = csv.writer(fid)
+            writer.writerow(fleet_row._fields)
+            for row in self :
+                writer.writerow(row)
+
+    def summary(self) :
+        elapsed = sorted([row.elapsed for row in self if row.elapsed is not None])
+        return 'nodes={} ok={} failed={} retried={} elapsed max={}'.format(len(self), len(self.succeeded()), len(self.failed()), \
+                                                                          len([row for row in self if row.attempts > 1]), '{:.3f}'.format(elapsed[-1]) if elapsed else None)
+
+def endpoint(node) :
+    # the host an ssh connection for the node goes to
+    return node.relay or node.ipaddr
+
+def render(cmd, node) :
+    return cmd(node) if callable(cmd) else cmd.format(node=node)
+
+async def run(nodes, cmd, concurrency=64, rate=5.0, burst=10, retries=2, backoff=0.5, IO_TIMEOUT=None, CMD_TIMEOUT=30, masters=False) :
+    # masters=True runs the sessions over the pooled control masters, worth it when the fleet is
+    # driven again soon after, a one off command is cheaper over plain connections
+    from ssh_nodes import ssh_session
+    limit = asyncio.Semaphore(concurrency)
+    buckets = {}
+
+    async def one(node) :
+        text = render(cmd, node)
+        bucket = buckets.setdefault(endpoint(node), token_bucket(rate, burst))
+        attempts = 0
+        error = None
+        while True :
+            attempts += 1
+            # the token is taken before the slot so a host waiting on its endpoint's rate doesn't
+            # hold a slot other endpoints could use, and the slot is held for the attempt only,
+            # not across a retry's backoff
+            await bucket.acquire()
+            async with limit :
+                session = ssh_session(name=node.name, hostname=node.ipaddr, node=node, silent_mode=True, ssh_speedups=masters)
+                session.stdout = bytearray()
+                session.stderr = bytearray()
+                try :
+                    await session.post_cmd(cmd=text, IO_TIMEOUT=IO_TIMEOUT, CMD_TIMEOUT=CMD_TIMEOUT)
+                    error = None
+                except OSError as err :
+                    # e.g. out of fds or processes locally, same backoff as a refused connection
+                    error = str(err)
+                    session.returncode = None
+            stderr = bytes(session.stderr).decode('utf-8', errors='replace')
+            transient = error is not None or (session.returncode == 255 and TRANSIENT.search(stderr))
+            if not transient or attempts > retries :
+                break
+            delay = backoff * (2 ** (attempts - 1)) * (1 + random.random())
+            logging.info('{} transient failure ({}), retry {} in {:.2f} sec'.format(node.name, error or stderr.strip(), attempts, delay))
+            await asyncio.sleep(delay)
+        return fleet_row(node.name, text, session.returncode, session.elapsed, attempts, bytes(session.stdout).decode('utf-8', errors='replace'), stderr, error)
+
+    start = time.monotonic()
+    rows = fleet_results(await asyncio.gather(*[one(node) for node in nodes]))
+    logging.info('fleet {} in {:.3f} sec'.format(rows.summary(), time.monotonic() - start))
+    return rows
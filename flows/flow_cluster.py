@@ -0,0 +1,137 @@
+# ---------------------------------------------------------------
+# * Copyright (c) 2018
+# * Broadcom Corporation
+# * All Rights Reserved.
+# *---------------------------------------------------------------
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.  Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the documentation and/or other
+# materials provided with the distribution.  Neither the name of the Broadcom nor the names of
+# contributors may be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Clustering of runs by their latency distributions using closed form 1-D Wasserstein distances
+#
+# Date October 2026
+
+import logging
+import collections
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# The 1-D Wasserstein distance is the L1 distance between the two cdfs (the area between them), or
+# equivalently between the two quantile functions. So each run becomes a vector, either its cdf on the
+# union bin grid scaled by the grid spacing or its quantiles at evenly spaced levels, and all pairs are
+# a single cityblock pdist. Up to LINKAGE_MAX_RUNS the runs are clustered with ward linkage directly,
+# beyond that a linkage is built on an evenly spaced subset and the remaining runs are assigned to the
+# nearest cluster medoid in batches, which keeps 10k runs per flow well within memory.
+LINKAGE_MAX_RUNS = 2000
+CDF_MAX_BYTES = 256 * 1024 * 1024
+QUANTILE_LEVELS = 200
+ASSIGN_BATCH = 4096
+
+cluster_result = collections.namedtuple('cluster_result', ['labels', 'medoids', 'outliers', 'medoid_distance', 'embedding'])
+
+def cdf_vectors(histograms) :
+    grid = np.unique(np.concatenate([h.bins * h.binwidth for h in histograms]).astype(np.float64))
+    dx = np.diff(grid, append=grid[-1])
+    vectors = np.empty((len(histograms), len(grid)))
+    for ix, h in enumerate(histograms) :
+        cumulative = np.concatenate(([0], np.cumsum(h.counts))) / float(np.sum(h.counts))
+        vectors[ix] = cumulative[np.searchsorted(h.bins * h.binwidth, grid, side='right')]
+    # scaling by the spacing makes the cityblock distance the area between the cdfs
+    return vectors * dx
+
+def quantile_vectors(histograms, levels=QUANTILE_LEVELS) :
+    q = (np.arange(levels) + 0.5) / levels
+    vectors = np.empty((len(histograms), levels))
+    for ix, h in enumerate(histograms) :
+        cumulative = np.cumsum(h.counts)
+        pos = np.searchsorted(cumulative, q * cumulative[-1], side='right')
+        vectors[ix] = h.bins[np.minimum(pos, len(h.bins) - 1)] * h.binwidth
+    # mean absolute difference of the quantiles approximates the Wasserstein distance
+    return vectors / float(levels)
+
+def embed(histograms, embedding='auto') :
+    if embedding == 'auto' :
+        gridsize = len(np.unique(np.concatenate([h.bins * h.binwidth for h in histograms])))
+        embedding = 'cdf' if (len(histograms) * gridsize * 8) <= CDF_MAX_BYTES else 'quantile'
+    if embedding == 'cdf' :
+        return cdf_vectors(histograms), embedding
+    return quantile_vectors(histograms), embedding
+
+def wasserstein_matrix(histograms, embedding='auto') :
+    from scipy.spatial import distance
+    # condensed matrix of the all pairs Wasserstein distances (us)
+    vectors, embedding = embed(histograms, embedding=embedding)
+    return distance.pdist(vectors, 'cityblock')
+
+def _medoids(vectors, labels) :
+    from scipy.spatial import distance
+    medoids = {}
+    for label in np.unique(labels) :
+        members = np.flatnonzero(labels == label)
+        if len(members) > ASSIGN_BATCH :
+            # a large cluster's medoid is searched for over a subset of its members
+            members = members[np.linspace(0, len(members) - 1, ASSIGN_BATCH).astype(np.int64)]
+        within = distance.cdist(vectors[members], vectors[members], 'cityblock')
+        medoids[int(label)] = int(members[np.argmin(within.sum(axis=1))])
+    return medoids
+
+def cluster(histograms, embedding='auto', threshold=0.75, outlier_iqr=3.0) :
+    from scipy.spatial import distance
+    from scipy.cluster import hierarchy
+    # ward linkage cut at threshold times the largest distance, the same criterion compute_ks_table uses
+    histograms = list(histograms)
+    n = len(histograms)
+    vectors, embedding = embed(histograms, embedding=embedding)
+    if n < 2 :
+        return cluster_result(np.ones(n, dtype=np.int64), {1 : 0} if n else {}, np.zeros(0, dtype=np.int64), np.zeros(n), embedding)
+
+    if n <= LINKAGE_MAX_RUNS :
+        sample = np.arange(n)
+    else :
+        sample = np.linspace(0, n - 1, LINKAGE_MAX_RUNS).astype(np.int64)
+    condensed = distance.pdist(vectors[sample], 'cityblock')
+    if condensed.max() > 0 :
+        linkage_matrix = hierarchy.linkage(condensed, 'ward')
+        sample_labels = hierarchy.fcluster(linkage_matrix, threshold * condensed.max(), criterion='distance')
+    else :
+        sample_labels = np.ones(len(sample), dtype=np.int64)
+    medoids = _medoids(vectors[sample], sample_labels)
+    medoids = {label : int(sample[ix]) for label, ix in medoids.items()}
+
+    medoid_labels = np.array(sorted(medoids.keys()))
+    medoid_vectors = vectors[[medoids[label] for label in medoid_labels]]
+    labels = np.empty(n, dtype=np.int64)
+    medoid_distance = np.empty(n)
+    if n <= LINKAGE_MAX_RUNS :
+        labels[:] = sample_labels
+        medoid_distance[:] = distance.cdist(vectors, medoid_vectors, 'cityblock')[np.arange(n), np.searchsorted(medoid_labels, labels)]
+    else :
+        logging.info('Clustering {} runs, linkage over {} and assigning the rest to {} medoids'.format(n, len(sample), len(medoid_labels)))
+        for start in range(0, n, ASSIGN_BATCH) :
+            d = distance.cdist(vectors[start:start + ASSIGN_BATCH], medoid_vectors, 'cityblock')
+            nearest = np.argmin(d, axis=1)
+            labels[start:start + ASSIGN_BATCH] = medoid_labels[nearest]
+            medoid_distance[start:start + ASSIGN_BATCH] = d[np.arange(len(nearest)), nearest]
+
+    # outlier runs sit in a cluster of their own or unusually far from their medoid
+    sizes = np.bincount(labels)
+    q1, q3 = np.percentile(medoid_distance, [25, 75])
+    far = medoid_distance > q3 + outlier_iqr * (q3 - q1)
+    outliers = np.flatnonzero(far | (sizes[labels] == 1))
+    return cluster_result(labels, medoids, outliers, medoid_distance, embedding)
@@ -36,20 +36,25 @@ import weakref
 import os
 import getpass
 import math
-import scipy
-import scipy.spatial
 import numpy as np
-import tkinter
 import ctypes
 import ipaddress
 import collections
 import csv
+import histogram_stats
+import ks_cache
+import histogram_archive
+import flow_cluster
+import results_db
+import io
+
+from plot_workers import gnuplot_pool, render_pipeline, plot_manifest
+import plot_workers
+import ks_report
+import deadline_scheduler
+from ssh_nodes import ssh_master_pool, ssh_node
 
 from datetime import datetime as datetime, timezone
-from scipy import stats
-from scipy.cluster import hierarchy
-from scipy.cluster.hierarchy import linkage
-import matplotlib.pyplot as plt
 from collections import defaultdict
 
 logger = logging.getLogger(__name__)
@@ -59,6 +64,11 @@ class iperf_flow(object):
     iperf = '/usr/bin/iperf'
     instances = weakref.WeakSet()
     _loop = None
+    _renderer = None
+    # an interval_export.interval_exporter, when set every per interval sample is streamed to it
+    exporter = None
+    # seconds without any iperf output before the server or client ssh is terminated, None is no io watchdog
+    io_timeout = None
     flow_scope = ("flowstats")
     tasks = []
     flowid2name = defaultdict(str)
@@ -71,19 +81,27 @@ class iperf_flow(object):
     @property
     def loop(cls):
         if not cls._loop :
-            try :
-                cls._loop = asyncio.get_running_loop()
-            except :
-              if os.name == 'nt':
-                  # On Windows, the ProactorEventLoop is necessary to listen on pipes
-                  cls._loop = asyncio.ProactorEventLoop()
-              else:
-                  cls._loop = asyncio.new_event_loop()
+            # share the nodes' loop so rexec, consoles and samplers run while the flows do
+            cls._loop = ssh_node.loop
         return cls._loop
 
 
+    @classmethod
+    def renderer(cls, workers=None, max_pending=None) :
+        # shared off loop matplotlib rendering, see plot_workers.render_pipeline
+        if not cls._renderer :
+            cls._renderer = render_pipeline(workers=workers, max_pending=max_pending)
+        return cls._renderer
+
     @classmethod
     def close_loop(cls):
+        if iperf_flow.exporter :
+            iperf_flow.exporter.close()
+        if iperf_flow._renderer :
+            iperf_flow._renderer.close()
+            iperf_flow._renderer = None
+        if not iperf_flow.loop.is_running() and not iperf_flow.loop.is_closed() :
+            iperf_flow.loop.run_until_complete(gnuplot_pool.close_all())
         if iperf_flow.loop.is_running():
             iperf_flow.loop.run_until_complete(loop.shutdown_asyncgens())
             iperf_flow.loop.close()
@@ -257,7 +275,7 @@ class iperf_flow(object):
     async def cleanup(cls, host=None, sshcmd='/usr/bin/ssh', user='root') :
         if host:
             logging.info('ssh {}@{} pkill iperf'.format(user, host))
-            childprocess = await asyncio.create_subprocess_exec(sshcmd, '{}@{}'.format(user, host), 'pkill', 'iperf', stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            childprocess = await asyncio.create_subprocess_exec(sshcmd, *await ssh_master_pool.options(user, host), '{}@{}'.format(user, host), 'pkill', 'iperf', stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
             stdout, _ = await childprocess.communicate()
             if stdout:
                 logging.info('cleanup: host({}) stdout={} '.format(host, stdout))
@@ -388,6 +406,7 @@ class iperf_flow(object):
         self.flowstats['reads']=[]
         self.flowstats['histograms']=[]
         self.flowstats['histogram_names'] = set()
+        self.flowstats['histogram_series'] = {}
         self.flowstats['connect_time']=[]
         self.flowstats['trip_time']=[]
         self.flowstats['jitter']=[]
@@ -402,6 +421,7 @@ class iperf_flow(object):
         self.flowstats['inPvar']=[]
         self.flowstats['rxpkts']=[]
         self.flowstats['netPower']=[]
+        self.flowstats['device_runs']=[]
 
     async def start(self):
         self.flowstats = {'current_rxbytes' : None , 'current_txbytes' : None , 'flowrate' : None, 'flowid' : None}
@@ -429,7 +449,47 @@ class iperf_flow(object):
     def stats(self):
         logging.info('stats')
 
-    def compute_ks_table(self, runcount, plot=True, directory='.', title=None) :
+    def run_summary(self) :
+        # one value per metric for the current run's flowstats, e.g. to feed a regression_detector
+        def mean(values) :
+            values = np.asarray(values, dtype=np.float64)
+            return float(values.mean()) if len(values) else None
+        summary = {}
+        summary['throughput'] = mean(self.flowstats['rxthroughput'] or self.flowstats['txthroughput'])
+        summary['connect_time'] = mean(self.flowstats['connect_time'])
+        totpkts = np.asarray(self.flowstats['rxtotpkts'], dtype=np.float64).sum()
+        summary['loss'] = float(np.asarray(self.flowstats['rxlostpkts'], dtype=np.float64).sum() / totpkts) if totpkts else None
+        for this_name in self.flowstats['histogram_names'] :
+            histograms = [h for h in self.flowstats['histograms'] if h.name == this_name]
+            h = histograms[0] if len(histograms) == 1 else flow_histogram.merge(histograms)
+            summary['p99_{}'.format(this_name)] = float(h.percentile(99))
+            summary['entropy_{}'.format(this_name)] = h.entropy
+        for run in self.flowstats.get('device_runs', []) :
+            for dut, value in zip(run.duts, run.mpdu_per_ampdu) :
+                summary['{}_mpdu_per_ampdu'.format(dut)] = None if np.isnan(value) else float(value)
+        return summary
+
+    def attach_device_run(self, run, histograms=False) :
+        # run is a wl_dumps.device_run for the DUTs of this flow's run, histograms=True also adds the
+        # per DUT dump histograms, e.g. tx_mpdudens, to the flow's histograms so they're KS compared across runs
+        import wl_dumps
+        self.flowstats['device_runs'].append(run)
+        if histograms :
+            for dut, record in run.records.items() :
+                for this_cmd, this_record in record.items() :
+                    for h in wl_dumps.histograms(this_record, prefix=dut).values() :
+                        self.flowstats['histograms'].append(h)
+                        self.flowstats['histogram_names'].add(h.name)
+
+    def compute_ks_table(self, runcount, plot=True, directory='.', title=None, workers=None, cache=None) :
+        # cache is a ks_cache or the file name of one, e.g. directory + '/ks_cache.db'
+        # plot=True renders the summary views (heatmap, cdf overlay and html index), plot='pairs' also
+        # renders every two sample KS pair, otherwise a pair is rendered on request with plot_ks_pair()
+        from scipy.spatial import distance
+        from scipy.cluster import hierarchy
+        cache_opened = isinstance(cache, str)
+        if cache_opened :
+            cache = ks_cache.ks_cache(cache)
 
         tmp = "Processing histogram for traffic with Server={0} Client={1} {2} and run count {3}".format(self.server, self.client, self.dstip, runcount)
         logging.info(tmp)
@@ -441,6 +501,8 @@ class iperf_flow(object):
             print(tmp)
             #raise
 
+        # the plots render while the next name's table is computed and are waited on at the end
+        renders = []
         for this_name in self.histogram_names :
             # group by name
             histograms = [h for h in self.histograms if h.name == this_name]
@@ -456,27 +518,20 @@ class iperf_flow(object):
                 print(tmp)
                 #raise
 
-            self.condensed_distance_matrix = ([])
+            n = len(histograms)
+            self.condensed_distance_matrix, self.condensed_pvalues = histogram_stats.ks_table(histograms, workers=workers, name='{} {}'.format(self.name, this_name), cache=cache)
 
             tasks = []
             for rowindex, h1 in enumerate(histograms) :
-                resultstr = rowindex * 'x'
-                maxp = None
-                minp = None
-                for h2 in histograms[rowindex:] :
-                    d,p = stats.ks_2samp(h1.samples, h2.samples)
-                    if h1 is not h2 :
-                        self.condensed_distance_matrix = np.append(self.condensed_distance_matrix,d)
-                    logging.debug('D,p={},{} cp={}'.format(str(d),str(p), str(self.ks_critical_p)))
-                    if not minp or p < minp :
-                        minp = p
-                    if not maxp or (p != 1 and p > maxp) :
-                        maxp = p
-                    if p > self.ks_critical_p :
-                        resultstr += '1'
-                    else :
-                        resultstr += '0'
-                    if plot :
+                start = histogram_stats.condensed_index(n, rowindex, rowindex + 1)
+                # the diagonal, i.e. a histogram against itself, is D=0 and p=1
+                rowd = np.concatenate(([0.0], self.condensed_distance_matrix[start:start + n - rowindex - 1]))
+                rowp = np.concatenate(([1.0], self.condensed_pvalues[start:start + n - rowindex - 1]))
+                logging.debug('D={} p={} cp={}'.format(str(rowd), str(rowp), str(self.ks_critical_p)))
+                resultstr = rowindex * 'x' + ''.join(np.where(rowp > self.ks_critical_p, '1', '0'))
+                minp = rowp.min()
+                if plot == 'pairs' :
+                    for h2 in histograms[rowindex:] :
                         tasks.append(asyncio.ensure_future(flow_histogram.plot_two_sample_ks(h1=h1, h2=h2, flowname=self.name, title=title, directory=directory), loop=iperf_flow.loop))
                 print('KS: {0}({1:3d}):{2} minp={3} ptest={4}'.format(this_name, rowindex, resultstr, str(minp), str(self.ks_critical_p)))
                 logging.info('KS: {0}({1:3d}):{2} minp={3} ptest={4}'.format(this_name, rowindex, resultstr, str(minp), str(self.ks_critical_p)))
@@ -488,23 +543,71 @@ class iperf_flow(object):
                         logging.error('plot timed out')
                         raise
             logging.info('{} {}(condensed distance matrix)\n{}'.format(self.name, this_name,self.condensed_distance_matrix))
-            self.linkage_matrix=linkage(self.condensed_distance_matrix, 'ward')
+            self.linkage_matrix=hierarchy.linkage(self.condensed_distance_matrix, 'ward')
             try :
-                plt.figure(figsize=(18,10))
-                dn = hierarchy.dendrogram(self.linkage_matrix)
-                plt.title("{} {}".format(self.name, this_name))
-                plt.savefig('{}/dn_{}_{}.png'.format(directory,self.name,this_name))
-                logging.info('{} {}(distance matrix)\n{}'.format(self.name, this_name,scipy.spatial.distance.squareform(self.condensed_distance_matrix)))
-                print('{} {}(distance matrix)\n{}'.format(self.name, this_name,scipy.spatial.distance.squareform(self.condensed_distance_matrix)))
+                renders.append(iperf_flow.renderer().submit(plot_workers.render_dendrogram, self.linkage_matrix, '{}/dn_{}_{}.png'.format(directory,self.name,this_name), title="{} {}".format(self.name, this_name)))
+                logging.info('{} {}(distance matrix)\n{}'.format(self.name, this_name,distance.squareform(self.condensed_distance_matrix)))
+                print('{} {}(distance matrix)\n{}'.format(self.name, this_name,distance.squareform(self.condensed_distance_matrix)))
                 print('{} {}(cluster linkage)\n{}'.format(self.name,this_name,self.linkage_matrix))
                 logging.info('{} {}(cluster linkage)\n{}'.format(self.name,this_name,self.linkage_matrix))
-                flattened=scipy.cluster.hierarchy.fcluster(self.linkage_matrix, 0.75*self.condensed_distance_matrix.max(), criterion='distance')
+                flattened=hierarchy.fcluster(self.linkage_matrix, 0.75*self.condensed_distance_matrix.max(), criterion='distance')
                 print('{} {} Clusters:{}'.format(self.name, this_name, flattened))
                 logging.info('{} {} Clusters:{}'.format(self.name, this_name, flattened))
             except:
-                pass
-
-    def dump_stats(self, directory='.') :
+                flattened = np.ones(n, dtype=np.int64)
+            if plot :
+                renders.extend(self.plot_ks_summary(this_name, histograms, flattened, directory=directory, title=title))
+        if renders :
+            iperf_flow.renderer().wait(renders)
+        if cache_opened :
+            cache.close()
+
+    def cluster_runs(self, embedding='auto') :
+        # cluster the runs per histogram name by Wasserstein distance, scales to many more runs than compute_ks_table
+        self.clusters = {}
+        for this_name in self.histogram_names :
+            histograms = [h for h in self.histograms if h.name == this_name]
+            result = flow_cluster.cluster(histograms, embedding=embedding)
+            self.clusters[this_name] = result
+            tmp = '{} {} Clusters:{} medoids={} outliers={} ({})'.format(self.name, this_name, result.labels, result.medoids, result.outliers, result.embedding)
+            logging.info(tmp)
+            print(tmp)
+        return self.clusters
+
+    def plot_ks_summary(self, this_name, histograms, clusters, directory='.', title=None) :
+        # one heatmap and one cdf overlay per flow and histogram name, both linear in output size,
+        # returns the render futures
+        os.makedirs(directory, exist_ok=True)
+        basename = 'ks_{}_{}'.format(self.name, this_name)
+        mytitle = '{} {} {}'.format(self.name, this_name, title or '')
+        renderer = iperf_flow.renderer()
+        heatmap = basename + '_heatmap.png'
+        futures = [renderer.submit(plot_workers.render_ks_heatmap, self.condensed_distance_matrix, self.condensed_pvalues, os.path.join(directory, heatmap), title=mytitle)]
+        curves = [(h.bins * h.binwidth / 1000.0, h.cumulative / float(h.population)) for h in histograms]
+        overlay = basename + '_cdf.png'
+        futures.append(renderer.submit(plot_workers.render_cdf_overlay, curves, [int(c) for c in clusters], os.path.join(directory, overlay), title=mytitle))
+        # same layout plot_two_sample_ks writes its pair plots to
+        pairpattern = '{0}{1}/{1}_{{i}}/{1}_{{i}}_{{j}}.png'.format(self.name, this_name)
+        ks_report.write_summary(directory, self.name, this_name, self.condensed_distance_matrix, self.condensed_pvalues, clusters, heatmap, overlay, pairpattern, self.ks_critical_p)
+        ks_report.write_index(directory)
+        return futures
+
+    def plot_ks_pair(self, this_name, i, j, directory='.', title=None) :
+        # render a single two sample KS pair on demand, e.g. a cell picked from the summary heatmap
+        histograms = [h for h in self.histograms if h.name == this_name]
+        for index, h in enumerate(histograms) :
+            h.ks_index = index
+        iperf_flow.loop.run_until_complete(flow_histogram.plot_two_sample_ks(h1=histograms[min(i, j)], h2=histograms[max(i, j)], flowname=self.name, title=title, directory=directory))
+
+    def export_interval(self, side, m, metrics) :
+        if iperf_flow.exporter :
+            iperf_flow.exporter.add_match(self.name, self.flowstats['flowid'], side, m, metrics)
+
+    def merged_histograms(self) :
+        # one histogram per histogram name summed over all the runs
+        return {name : flow_histogram.merge([h for h in self.histograms if h.name == name]) for name in self.histogram_names}
+
+    def dump_stats(self, directory='.', db=None, test=None, run_id=None) :
             logging.info("\n********************** dump_stats for flow {} **********************".format(self.name))
 
             #logging.info('This flow Name={} id={} items_cnt={}'.format(iperf_flow.flowid2name[self.flowstats['flowid']], str(self.flowstats['flowid']), len(self.flowstats)))
@@ -518,15 +621,45 @@ class iperf_flow(object):
 
             logging.info("Writing stats to '{}'".format(csvfilename))
 
-            for stat_name in [stat for stat in self.flowstats.keys() if stat != 'histograms'] :
+            # the histograms, interval series and device deltas are objects, not csv cells, they go to
+            # the archive and their csv cells list the content hashes they're archived under
+            import wl_dumps
+            archive = histogram_archive.histogram_archive(os.path.join(directory, 'histograms'))
+            stored = {'histograms' : [h.content_hash for h in self.flowstats['histograms']], \
+                      'histogram_series' : [archive.store('series', self.flowstats['histogram_series'][name].arrays()) for name in sorted(self.flowstats['histogram_series'])], \
+                      'device_runs' : [archive.store('device_runs', wl_dumps.arrays(run)) for run in self.flowstats['device_runs']], \
+                      'histogram_names' : sorted(self.flowstats['histogram_names'])}
+
+            for stat_name in [stat for stat in self.flowstats.keys() if stat not in stored] :
                 logging.info("{}={}".format(stat_name, str(self.flowstats[stat_name])))
 
             with open(csvfilename, 'w', newline='') as fd :
                 keynames = self.flowstats.keys()
                 writer = csv.writer(fd)
                 writer.writerow(keynames)
-                writer.writerow([self.flowstats[keyname] for keyname in keynames])
-                writer.writerow([h.samples for h in self.flowstats['histograms']])
+                writer.writerow([stored.get(keyname, self.flowstats[keyname]) for keyname in keynames])
+                # the histograms themselves go to the binary archive, the csv only references them
+                writer.writerow(stored['histograms'])
+
+            if self.flowstats['histograms'] :
+                # once per run, histograms accumulate over runs but a repeat run with identical
+                # content is still a run of its own, so it's not deduplicated by content_hash
+                archivepath = os.path.abspath(archive.directory)
+                histograms = [h for h in self.flowstats['histograms'] if archivepath not in h.stored]
+                if histograms :
+                    logging.info("Archiving {} histograms to '{}'".format(len(histograms), archive.directory))
+                    archive.append(histograms, flowname=self.name, flowid=self.flowstats['flowid'])
+                    for h in histograms :
+                        h.stored.add(archivepath)
+
+            # db is a results_db or the file name of one, the flow's rows go in as one transaction
+            if db is not None :
+                if isinstance(db, str) :
+                    thisdb = results_db.results_db(db)
+                    thisdb.insert_flow(self, run_id=run_id, test=test)
+                    thisdb.close()
+                else :
+                    db.insert_flow(self, run_id=run_id, test=test)
 
 class iperf_server(object):
 
@@ -538,6 +671,8 @@ class iperf_server(object):
             self._closed_stderr = False
             self._mypid = None
             self._server = server
+            self._transport = None
+            self.iowatchdog = None
             self._stdoutbuffer = ""
             self._stderrbuffer = ""
 
@@ -566,9 +701,18 @@ class iperf_server(object):
         def connection_made(self, trans):
             self._server.closed.clear()
             self._mypid = trans.get_pid()
+            self._transport = trans
             logging.debug('server connection made pid=({})'.format(self._mypid))
+            if iperf_flow.io_timeout is not None :
+                self.iowatchdog = deadline_scheduler.shared(iperf_flow.loop).watch(self.io_timer, iperf_flow.io_timeout)
+
+        def io_timer(self) :
+            logging.error("{} IO timeout: host(pid)={}({})".format(self._server.name, self._server.host, self._mypid))
+            self._transport.terminate()
 
         def pipe_data_received(self, fd, data):
+            if self.iowatchdog :
+                self.iowatchdog.touch()
             if self.debug :
                 logging.debug('{} {}'.format(fd, data))
             data = data.decode("utf-8")
@@ -590,6 +734,7 @@ class iperf_server(object):
                                 timestamp = datetime.now()
                                 if not self._server.traffic_event.is_set() :
                                     self._server.traffic_event.set()
+                                self.flow.export_interval('rx', m, ('bytes', 'throughput', 'reads'))
 
                                 bytes = float(m.group('bytes'))
                                 if self.flowstats['current_txbytes'] :
@@ -617,6 +762,7 @@ class iperf_server(object):
                                 timestamp = datetime.now()
                                 if not self._server.traffic_event.is_set() :
                                     self._server.traffic_event.set()
+                                self.flow.export_interval('rx', m, ('bytes', 'throughput', 'jitter', 'lost_pkts', 'tot_pkts', 'lat_mean', 'lat_min', 'lat_max', 'lat_stdev', 'pps', 'inP', 'inPvar', 'pkts', 'netPower'))
                                 self.flowstats['rxbytes'].append(m.group('bytes'))
                                 self.flowstats['rxthroughput'].append(m.group('throughput'))
                                 self.flowstats['jitter'].append(m.group('jitter'))
@@ -639,6 +785,13 @@ class iperf_server(object):
                             this_histogram = flow_histogram(name=m.group('pdfname'),values=m.group('pdf'), population=m.group('population'), binwidth=m.group('binwidth'), starttime=self.flowstats['starttime'], endtime=timestamp, outliers=m.group('outliers'), uci=m.group('uci'), uci_val=m.group('uci_val'), lci=m.group('lci'), lci_val=m.group('lci_val'))
                             self.flowstats['histograms'].append(this_histogram)
                             logging.info('pdf {} found with bin width={} us'.format(m.group('pdfname'), m.group('binwidth')))
+                        else :
+                            m = self._server.regex_interval_histogram_traffic.match(line)
+                            if m :
+                                name = m.group('pdfname')
+                                if name not in self.flowstats['histogram_series'] :
+                                    self.flowstats['histogram_series'][name] = flow_histogram_series(name=name, binwidth=m.group('binwidth'), starttime=self.flowstats['starttime'])
+                                self.flowstats['histogram_series'][name].append(start=m.group('start'), end=m.group('end'), values=m.group('pdf'), population=m.group('population'))
 
             elif fd == 2:
                 self._stderrbuffer += data
@@ -663,6 +816,8 @@ class iperf_server(object):
             self.signal_exit()
 
         def process_exited(self):
+            if self.iowatchdog :
+                self.iowatchdog.cancel()
             logging.debug('subprocess with pid={} closed'.format(self._mypid))
             self._exited = True
             self._mypid = None
@@ -691,9 +846,11 @@ class iperf_server(object):
         self.adapter = self.CustomAdapter(logger, {'connid': conn_id})
 
         # ex. [  4] 0.00-0.50 sec  657090 Bytes  10513440 bits/sec  449    449:0:0:0:0:0:0:0
-        self.regex_traffic = re.compile(r'\[\s+\d+] (?P<timestamp>.*) sec\s+(?P<bytes>[0-9]+) Bytes\s+(?P<throughput>[0-9]+) bits/sec\s+(?P<reads>[0-9]+)')
-        self.regex_traffic_udp = re.compile(r'\[\s+\d+] (?P<timestamp>.*) sec\s+(?P<bytes>[0-9]+) Bytes\s+(?P<throughput>[0-9]+) bits/sec\s+(?P<jitter>[0-9.]+)\sms\s(?P<lost_pkts>[0-9]+)/(?P<tot_pkts>[0-9]+).+(?P<lat_mean>[0-9.]+)/(?P<lat_min>[0-9.]+)/(?P<lat_max>[0-9.]+)/(?P<lat_stdev>[0-9.]+)\sms\s(?P<pps>[0-9]+)\spps\s+(?P<netPower>[0-9\.]+)\/(?P<inP>[0-9]+)\((?P<inPvar>[0-9]+)\)\spkts\s(?P<pkts>[0-9]+)')
+        self.regex_traffic = re.compile(r'\[\s+(?P<stream>\d+)] (?P<timestamp>.*) sec\s+(?P<bytes>[0-9]+) Bytes\s+(?P<throughput>[0-9]+) bits/sec\s+(?P<reads>[0-9]+)')
+        self.regex_traffic_udp = re.compile(r'\[\s+(?P<stream>\d+)] (?P<timestamp>.*) sec\s+(?P<bytes>[0-9]+) Bytes\s+(?P<throughput>[0-9]+) bits/sec\s+(?P<jitter>[0-9.]+)\sms\s(?P<lost_pkts>[0-9]+)/(?P<tot_pkts>[0-9]+).+(?P<lat_mean>[0-9.]+)/(?P<lat_min>[0-9.]+)/(?P<lat_max>[0-9.]+)/(?P<lat_stdev>[0-9.]+)\sms\s(?P<pps>[0-9]+)\spps\s+(?P<netPower>[0-9\.]+)\/(?P<inP>[0-9]+)\((?P<inPvar>[0-9]+)\)\spkts\s(?P<pkts>[0-9]+)')
         self.regex_final_histogram_traffic = re.compile(r'\[\s*\d+\] (?P<timestamp>.*) sec\s+(?P<pdfname>[A-Za-z0-9\-]+)\(f\)-PDF: bin\(w=(?P<binwidth>[0-9]+)us\):cnt\((?P<population>[0-9]+)\)=(?P<pdf>.+)\s+\((?P<lci>[0-9\.]+)/(?P<uci>[0-9\.]+)/(?P<uci2>[0-9\.]+)%=(?P<lci_val>[0-9]+)/(?P<uci_val>[0-9]+)/(?P<uci_val2>[0-9]+),Outliers=(?P<outliers>[0-9]+),obl/obu=[0-9]+/[0-9]+\)')
+        # ex. [  1] 1.00-2.00 sec T8-PDF: bin(w=100us):cnt(449)=1:3,2:440,9:6 (5.00/95.00/99.7%=2/2/9,Outliers=6,obl/obu=0/0) (0.853 ms/1635976410.123)
+        self.regex_interval_histogram_traffic = re.compile(r'\[\s*\d+\] (?P<start>[0-9\.]+)\s*-\s*(?P<end>[0-9\.]+) sec\s+(?P<pdfname>[A-Za-z0-9\-]+)-PDF: bin\(w=(?P<binwidth>[0-9]+)us\):cnt\((?P<population>[0-9]+)\)=(?P<pdf>[0-9:,]+)\s')
         # 0.0000-0.5259 trip-time (3WHS done->fin+finack) = 0.5597 sec
         self.regex_trip_time = re.compile(r'.+trip\-time\s+\(3WHS\sdone\->fin\+finack\)\s=\s(?P<trip_time>\d+\.\d+)\ssec')
         self.regex_rx_bind_failed = re.compile(r'listener bind failed: Cannot assign requested address')
@@ -712,9 +869,9 @@ class iperf_server(object):
         self.remotepid = None
         if time :
             iperftime = time + 30
-            self.sshcmd=[self.ssh, self.user + '@' + self.host, self.iperf, '-s', '-p ' + str(self.dstport), '-P 1', '-e', '-t ' + str(iperftime), '-f{}'.format(self.format), '-w' , self.window, '--realtime']
+            self.sshcmd=[self.ssh, *await ssh_master_pool.options(self.user, self.host), self.user + '@' + self.host, self.iperf, '-s', '-p ' + str(self.dstport), '-P 1', '-e', '-t ' + str(iperftime), '-f{}'.format(self.format), '-w' , self.window, '--realtime']
         else :
-            self.sshcmd=[self.ssh, self.user + '@' + self.host, self.iperf, '-s', '-p ' + str(self.dstport), '-P 1', '-e', '-f{}'.format(self.format), '-w' , self.window, '--realtime']
+            self.sshcmd=[self.ssh, *await ssh_master_pool.options(self.user, self.host), self.user + '@' + self.host, self.iperf, '-s', '-p ' + str(self.dstport), '-P 1', '-e', '-f{}'.format(self.format), '-w' , self.window, '--realtime']
         if self.interval >= 0.005 :
             self.sshcmd.extend(['-i ', str(self.interval)])
         if self.server_device and self.srcip :
@@ -730,7 +887,7 @@ class iperf_server(object):
 
     async def signal_stop(self):
         if self.remotepid and not self.finished :
-            childprocess = await asyncio.create_subprocess_exec(self.ssh, '{}@{}'.format(self.user, self.host), 'kill', '-HUP', '{}'.format(self.remotepid), stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            childprocess = await asyncio.create_subprocess_exec(self.ssh, *await ssh_master_pool.options(self.user, self.host), '{}@{}'.format(self.user, self.host), 'kill', '-HUP', '{}'.format(self.remotepid), stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
             logging.debug('({}) sending signal HUP to {} (pid={})'.format(self.user, self.host, self.remotepid))
             stdout, _ = await childprocess.communicate()
             if stdout:
@@ -752,6 +909,8 @@ class iperf_client(object):
             self._closed_stderr = False
             self._mypid = None
             self._client = client
+            self._transport = None
+            self.iowatchdog = None
             self._stdoutbuffer = ""
             self._stderrbuffer = ""
 
@@ -779,9 +938,18 @@ class iperf_client(object):
         def connection_made(self, trans):
             self._client.closed.clear()
             self._mypid = trans.get_pid()
+            self._transport = trans
             logging.debug('client connection made pid=({})'.format(self._mypid))
+            if iperf_flow.io_timeout is not None :
+                self.iowatchdog = deadline_scheduler.shared(iperf_flow.loop).watch(self.io_timer, iperf_flow.io_timeout)
+
+        def io_timer(self) :
+            logging.error("{} IO timeout: host(pid)={}({})".format(self._client.name, self._client.host, self._mypid))
+            self._transport.terminate()
 
         def pipe_data_received(self, fd, data):
+            if self.iowatchdog :
+                self.iowatchdog.touch()
             if self.debug :
                 logging.debug('{} {}'.format(fd, data))
             data = data.decode("utf-8")
@@ -842,6 +1010,7 @@ class iperf_client(object):
                                 timestamp = datetime.now()
                                 if not self._client.traffic_event.is_set() :
                                     self._client.traffic_event.set()
+                                self.flow.export_interval('tx', m, ('bytes', 'throughput', 'writes', 'errwrites', 'retry', 'cwnd', 'rtt'))
 
                                 bytes = float(m.group('bytes'))
                                 if self.flowstats['current_rxbytes'] :
@@ -892,6 +1061,8 @@ class iperf_client(object):
             self.signal_exit()
 
         def process_exited(self):
+            if self.iowatchdog :
+                self.iowatchdog.cancel()
             logging.debug('subprocess with pid={} closed'.format(self._mypid))
             self._exited = True
             self._mypid = None
@@ -920,7 +1091,7 @@ class iperf_client(object):
         conn_id = '{}'.format(self.name)
         self.adapter = self.CustomAdapter(logger, {'connid': conn_id})
         # traffic ex: [  3] 0.00-0.50 sec  655620 Bytes  10489920 bits/sec  14/211        446      446K/0 us
-        self.regex_traffic = re.compile(r'\[\s+\d+] (?P<timestamp>.*) sec\s+(?P<bytes>\d+) Bytes\s+(?P<throughput>\d+) bits/sec\s+(?P<writes>\d+)/(?P<errwrites>\d+)\s+(?P<retry>\d+)\s+(?P<cwnd>\d+)K/(?P<rtt>\d+) us')
+        self.regex_traffic = re.compile(r'\[\s+(?P<stream>\d+)] (?P<timestamp>.*) sec\s+(?P<bytes>\d+) Bytes\s+(?P<throughput>\d+) bits/sec\s+(?P<writes>\d+)/(?P<errwrites>\d+)\s+(?P<retry>\d+)\s+(?P<cwnd>\d+)K/(?P<rtt>\d+) us')
         self.regex_connect_time = re.compile(r'\[\s+\d+]\slocal.*\(ct=(?P<connect_time>\d+\.\d+) ms\)')
         # local 192.168.1.4 port 56949 connected with 192.168.1.1 port 61001
         self.regex_flowid = re.compile(r'\[\s+\d+]\slocal\s(?P<srcip>[0-9]{0,3}\.[0-9]{0,3}\.[0-9]{0,3}\.[0-9]{0,3}).*\sport\s(?P<srcport>[0-9]+)\sconnected with\s(?P<dstip>[0-9]{0,3}\.[0-9]{0,3}\.[0-9]{0,3}\.[0-9]{0,3})\sport\s(?P<dstport>[0-9]+)')
@@ -944,7 +1115,7 @@ class iperf_client(object):
             client_dst = self.dstip + '%' + self.client_device
         else :
             client_dst = self.dstip
-        self.sshcmd=[self.ssh, self.user + '@' + self.host, self.iperf, '-c', client_dst, '-p ' + str(self.dstport), '-e', '-f{}'.format(self.format), '-S ', iperf_flow.txt_to_tos(self.tos), '-w' , self.window ,'--realtime']
+        self.sshcmd=[self.ssh, *await ssh_master_pool.options(self.user, self.host), self.user + '@' + self.host, self.iperf, '-c', client_dst, '-p ' + str(self.dstport), '-e', '-f{}'.format(self.format), '-S ', iperf_flow.txt_to_tos(self.tos), '-w' , self.window ,'--realtime']
         if self.length :
             self.sshcmd.extend(['-l ', str(self.length)])
         if time:
@@ -1013,7 +1184,7 @@ class iperf_client(object):
 
     async def signal_stop(self):
         if self.remotepid and not self.finished :
-            childprocess = await asyncio.create_subprocess_exec(self.ssh, '{}@{}'.format(self.user, self.host), 'kill', '-HUP', '{}'.format(self.remotepid), stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            childprocess = await asyncio.create_subprocess_exec(self.ssh, *await ssh_master_pool.options(self.user, self.host), '{}@{}'.format(self.user, self.host), 'kill', '-HUP', '{}'.format(self.remotepid), stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
             logging.debug('({}) sending signal HUP to {} (pid={})'.format(self.user, self.host, self.remotepid))
             stdout, _ = await childprocess.communicate()
             if stdout:
@@ -1023,7 +1194,7 @@ class iperf_client(object):
 
     async def signal_pause(self):
         if self.remotepid :
-            childprocess = await asyncio.create_subprocess_exec(self.ssh, '{}@{}'.format(self.user, self.host), 'kill', '-STOP', '{}'.format(self.remotepid), stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            childprocess = await asyncio.create_subprocess_exec(self.ssh, *await ssh_master_pool.options(self.user, self.host), '{}@{}'.format(self.user, self.host), 'kill', '-STOP', '{}'.format(self.remotepid), stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
             logging.debug('({}) sending signal STOP to {} (pid={})'.format(self.user, self.host, self.remotepid))
             stdout, _ = await childprocess.communicate()
             if stdout:
@@ -1033,7 +1204,7 @@ class iperf_client(object):
 
     async def signal_resume(self):
         if self.remotepid :
-            childprocess = await asyncio.create_subprocess_exec(self.ssh, '{}@{}'.format(self.user, self.host), 'kill', '-CONT', '{}'.format(self.remotepid), stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            childprocess = await asyncio.create_subprocess_exec(self.ssh, *await ssh_master_pool.options(self.user, self.host), '{}@{}'.format(self.user, self.host), 'kill', '-CONT', '{}'.format(self.remotepid), stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
             logging.debug('({}) sending signal CONT to {} (pid={})'.format(self.user, self.host, self.remotepid))
             stdout, _ = await childprocess.communicate()
             if stdout:
@@ -1060,12 +1231,12 @@ class flow_histogram(object):
         if (h1.basefilename is not None) and (h2.basefilename is not None) :
             basefilename = '{}_{}_{}'.format(h1.basefilename, h1.ks_index, h2.ks_index)
             gpcfilename = basefilename + '.gpc'
-            #write out the gnuplot control file
-            with open(gpcfilename, 'w') as fid :
+            #build the gnuplot control script
+            with io.StringIO() as fid :
                 if outputtype == 'canvas' :
                     fid.write('set output \"{}.{}\"\n'.format(basefilename, 'html'))
                     fid.write('set terminal canvas standalone mousing size 1024,768\n')
-                if outputtype == 'svg' :
+                elif outputtype == 'svg' :
                     fid.write('set output \"{}_svg.{}\"\n'.format(basefilename, 'html'))
                     fid.write('set terminal svg size 1024,768 dynamic mouse\n')
                 else :
@@ -1123,24 +1294,56 @@ class flow_histogram(object):
                     fid.write('set xtics auto\n')
                     fid.write('set format x \"%.0f"\n')
                 fid.write('plot \"{0}\" using 1:2 index 0 axes x1y2 with impulses linetype 3 notitle,  \"{1}\" using 1:2 index 0 axes x1y2 with impulses linetype 2 notitle, \"{1}\" using 1:3 index 0 axes x1y1 with lines linetype 1 linewidth 2 notitle, \"{0}\" using 1:3 index 0 axes x1y1 with lines linetype -1 linewidth 2 notitle\n'.format(h1.datafilename, h2.datafilename))
+                script = fid.getvalue()
 
-            childprocess = await asyncio.create_subprocess_exec(flow_histogram.gnuplot,gpcfilename, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-            stdout, stderr = await childprocess.communicate()
-            if stderr :
-                logging.error('Exec {} {}'.format(flow_histogram.gnuplot, gpcfilename))
-            else :
-                logging.debug('Exec {} {}'.format(flow_histogram.gnuplot, gpcfilename))
+            outputs = flow_histogram.plot_outputs(basefilename, outputtype)
+            key = plot_manifest.key('ks', h1.datakey, h2.datakey, script)
+            if flow_histogram.skip_unchanged and plot_manifest.current(outputs, key) :
+                logging.debug('Plot {} unchanged, skipped'.format(outputs[0]))
+                return
+            if not await flow_histogram.exec_gnuplot(script, gpcfilename) :
+                plot_manifest.record(outputs, key)
+
+    @classmethod
+    async def exec_gnuplot(cls, script, gpcfilename) :
+        # plots go to the long lived gnuplot workers over stdin, the control file is only written when asked for
+        if flow_histogram.save_gpc :
+            with open(gpcfilename, 'w') as fid :
+                fid.write(script)
+        return await gnuplot_pool.get(size=flow_histogram.gnuplot_workers, gnuplot=flow_histogram.gnuplot).run(script, name=gpcfilename)
+
+    @staticmethod
+    def plot_outputs(basefilename, outputtype, thumbnail=False) :
+        # the files a plot script writes, see the set output lines of the scripts
+        if outputtype == 'canvas' :
+            return [basefilename + '.html']
+        elif outputtype == 'svg' :
+            return [basefilename + '_svg.html']
+        elif thumbnail :
+            return [basefilename + '.png', basefilename + '_thumb.png']
+        else :
+            return [basefilename + '.png']
 
     gnuplot = '/usr/bin/gnuplot'
-    def __init__(self, binwidth=None, name=None, values=None, population=None, starttime=None, endtime=None, title=None, outliers=None, lci = None, uci = None, lci_val = None, uci_val = None) :
-        self.raw = values
+    gnuplot_workers = None
+    save_gpc = False
+    # outputs recorded in a directory's plot_manifest with the same content key aren't regenerated
+    skip_unchanged = True
+    def __init__(self, binwidth=None, name=None, values=None, population=None, starttime=None, endtime=None, title=None, outliers=None, lci = None, uci = None, lci_val = None, uci_val = None, bins=None, counts=None) :
         self._entropy = None
         self._ks_1samp_dist = None
-        self.bins = self.raw.split(',')
+        self._samples = None
+        self._cumulative = None
+        if values is not None :
+            self.bins, self.counts = flow_histogram.parse_pdf(values)
+        else :
+            self.bins = np.asarray(bins, dtype=np.int64)
+            self.counts = np.asarray(counts, dtype=np.int64)
+        if population is None :
+            population = self.counts.sum()
         self.name = name
         self.ks_index = None
         self.population = int(population)
-        self.samples = np.zeros(int(self.population))
         self.binwidth = int(binwidth)
         self.createtime = datetime.now(timezone.utc).astimezone()
         self.starttime=starttime
@@ -1152,26 +1355,106 @@ class flow_histogram(object):
         self.lci = lci
         self.lci_val = lci_val
         self.basefilename = None
-        ix = 0
-        for bin in self.bins :
-            x,y = bin.split(':')
-            for i in range(int(y)) :
-                self.samples[ix] = x
-                ix += 1
+        self.datakey = None
+        self._content_hash = None
+        # results_db files and histogram archives this histogram was written to, see dump_stats()
+        self.stored = set()
+
+    @property
+    def content_hash(self) :
+        if self._content_hash is None :
+            self._content_hash = histogram_stats.content_hash(self)
+        return self._content_hash
+
+    @property
+    def samples(self) :
+        # Only expand to per sample values when something really needs them
+        if self._samples is None :
+            self._samples = np.repeat(self.bins.astype(np.float64), self.counts)
+        return self._samples
 
     @property
     def entropy(self) :
-        if not self._entropy :
-            self._entropy = 0
-            for bin in self.bins :
-                x,y = bin.split(':')
-                y1 = float(y) / float(self.population)
-                self._entropy -= y1 * math.log2(y1)
+        if self._entropy is None :
+            p = self.counts / float(self.population)
+            self._entropy = float(-np.sum(p * np.log2(p)))
         return self._entropy
 
+    @staticmethod
+    def parse_pdf(values) :
+        # values is the iperf pdf text of bin:count pairs, e.g. 1:3,2:10,7:1
+        # parse it in one pass into the bin indices and their counts
+        pairs = np.array(values.replace(':', ',').split(','), dtype=np.int64).reshape(-1, 2)
+        return pairs[:, 0], pairs[:, 1]
+
+    @classmethod
+    def merge(cls, histograms, name=None, title=None) :
+        # Sum histograms, e.g. all runs of a flow, a test or a day. Bin grids with different
+        # bin widths are rebinned to their least common multiple so no bin straddles two others
+        histograms = list(histograms)
+        binwidth = math.lcm(*[h.binwidth for h in histograms])
+        bins = np.concatenate([-(-(h.bins * h.binwidth) // binwidth) for h in histograms])
+        counts = np.concatenate([h.counts for h in histograms])
+        bins, inverse = np.unique(bins, return_inverse=True)
+        counts = np.bincount(inverse, weights=counts).astype(np.int64)
+        starttimes = [h.starttime for h in histograms if h.starttime]
+        endtimes = [h.endtime for h in histograms if h.endtime]
+        outliers = [int(h.outliers) for h in histograms if h.outliers is not None]
+        first = histograms[0]
+        merged = cls(name=(name or first.name), bins=bins, counts=counts, binwidth=binwidth, population=sum([h.population for h in histograms]), \
+                     starttime=(min(starttimes) if starttimes else None), endtime=(max(endtimes) if endtimes else None), title=title, \
+                     outliers=(sum(outliers) if outliers else None), lci=first.lci, uci=first.uci)
+        if merged.lci is not None :
+            merged.lci_val = merged.percentile_bin(float(merged.lci))
+        if merged.uci is not None :
+            merged.uci_val = merged.percentile_bin(float(merged.uci))
+        return merged
+
+    def __add__(self, other) :
+        return flow_histogram.merge([self, other])
+
+    # The cumulative counts back the O(bins) quantile, cdf and tail queries. Values are in us,
+    # a bin ix holds the samples up to ix * binwidth
+    @property
+    def cumulative(self) :
+        if self._cumulative is None :
+            self._cumulative = np.cumsum(self.counts)
+        return self._cumulative
+
+    def percentile_bin(self, percent) :
+        # same rule iperf uses for its lci/uci values, the first bin where the running count
+        # exceeds the percentage of the population
+        ix = np.searchsorted(self.cumulative, np.asarray(percent, dtype=np.float64) / 100.0 * self.population, side='right')
+        return self.bins[np.minimum(ix, len(self.bins) - 1)]
+
+    def percentile(self, percent) :
+        return self.percentile_bin(percent) * self.binwidth
+
+    def quantile(self, q) :
+        return self.percentile(np.asarray(q, dtype=np.float64) * 100.0)
+
+    def cdf(self, value) :
+        ix = np.searchsorted(self.bins * self.binwidth, np.asarray(value, dtype=np.float64), side='right')
+        return np.concatenate(([0], self.cumulative))[ix] / float(self.population)
+
+    def tail_probability(self, value) :
+        return 1.0 - self.cdf(value)
+
+    def validate_ci(self) :
+        valid = True
+        for ci, ci_val in [(self.lci, self.lci_val), (self.uci, self.uci_val)] :
+            if ci is None or ci_val is None :
+                continue
+            computed = int(self.percentile_bin(float(ci)))
+            if computed != int(ci_val) :
+                logging.warning('{} {}% bin mismatch, iperf={} computed={}'.format(self.name, ci, ci_val, computed))
+                valid = False
+        return valid
+
     @property
     def ks_1samp_dist(self):
         if not self._ks_1samp_dist :
+            from scipy import stats
             self._ks_1samp_dist,p = stats.ks_1samp(self.samples, stats.norm.cdf)
         return self._ks_1samp_dist
 
@@ -1183,15 +1466,6 @@ class flow_histogram(object):
     def ampdu_dump(self, value):
         self._ampdu_rawdump = value
 
-    async def __exec_gnuplot(self) :
-        logging.info('Plotting {} {}'.format(self.name, self.gpcfilename))
-        childprocess = await asyncio.create_subprocess_exec(flow_histogram.gnuplot, self.gpcfilename, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-        stdout, stderr = await childprocess.communicate()
-        if stderr :
-            logging.error('Exec {} {}'.format(flow_histogram.gnuplot, self.gpcfilename))
-        else  :
-            logging.debug('Exec {} {}'.format(flow_histogram.gnuplot, self.gpcfilename))
-
     async def write(self, directory='.', filename=None) :
         # write out the datafiles for the plotting tool,  e.g. gnuplot
         if filename is None:
@@ -1204,16 +1478,16 @@ class flow_histogram(object):
         logging.debug('Writing {} results to directory {}'.format(directory, filename))
         basefilename = os.path.join(directory, filename)
         datafilename = os.path.join(directory, filename + '.data')
-        self.max  = None
-        with open(datafilename, 'w') as fid :
-            cummulative = 0
-            for bin in self.bins :
-                x,y = bin.split(':')
-                #logging.debug('bin={} x={} y={}'.format(bin, x, y))
-                cummulative += float(y)
-                perc = cummulative / float(self.population)
-                self.max = float(x) * float(self.binwidth) / 1000.0 # max is the last value
-                fid.write('{} {} {}\n'.format((float(x) * float(self.binwidth) / 1000.0), int(y), perc))
+        values = self.bins * (float(self.binwidth) / 1000.0)
+        self.max = float(values[-1]) # max is the last value
+        self.datakey = plot_manifest.key('data', self.content_hash, self.population)
+        if flow_histogram.skip_unchanged and plot_manifest.current([datafilename], self.datakey) :
+            logging.debug('{} unchanged, not rewritten'.format(datafilename))
+        else :
+            perc = np.cumsum(self.counts) / float(self.population)
+            with open(datafilename, 'w') as fid :
+                np.savetxt(fid, np.column_stack((values, self.counts, perc)), fmt=['%.10g', '%d', '%.10g'])
+            plot_manifest.record([datafilename], self.datakey)
 
         self.basefilename = basefilename
         self.datafilename = datafilename
@@ -1224,12 +1498,14 @@ class flow_histogram(object):
 
         if self.basefilename is not None :
             self.gpcfilename = self.basefilename + '.gpc'
-            #write out the gnuplot control file
-            with open(self.gpcfilename, 'w') as fid :
+            basefilename = self.basefilename
+            datafilename = self.datafilename
+            #build the gnuplot control script
+            with io.StringIO() as fid :
                 if outputtype == 'canvas' :
                     fid.write('set output \"{}.{}\"\n'.format(basefilename, 'html'))
                     fid.write('set terminal canvas standalone mousing size 1024,768\n')
-                if outputtype == 'svg' :
+                elif outputtype == 'svg' :
                     fid.write('set output \"{}_svg.{}\"\n'.format(basefilename, 'html'))
                     fid.write('set terminal svg size 1024,768 dynamic mouse\n')
                 else :
@@ -1281,5 +1557,116 @@ class flow_histogram(object):
                     fid.write('set output \"{}_thumb.{}\"\n'.format(basefilename, 'png'))
                     fid.write('set terminal png transparent size 64,32 crop\n')
                     fid.write('plot \"{0}\" using 1:2 index 0 axes x1y2 with impulses linetype 3 notitle, \"{0}\" using 1:3 index 0 axes x1y1 with lines linetype -1 linewidth 2 notitle\n'.format(datafilename))
+                script = fid.getvalue()
+
+            outputs = flow_histogram.plot_outputs(basefilename, outputtype, thumbnail=True)
+            key = plot_manifest.key('plot', self.datakey, script)
+            if flow_histogram.skip_unchanged and plot_manifest.current(outputs, key) :
+                logging.info('Plot {} unchanged, skipped'.format(outputs[0]))
+                return
+            logging.info('Plotting {} {}'.format(self.name, self.gpcfilename))
+            if not await flow_histogram.exec_gnuplot(script, self.gpcfilename) :
+                plot_manifest.record(outputs, key)
+
+# The per interval pdfs of one histogram name over a run, i.e. iperf --histograms with -i, as a time by bin
+# count matrix. Rows are kept as compressed sparse rows since a row only has the bins that had samples
+class flow_histogram_series(object):
 
-            await self.__exec_gnuplot()
+    def __init__(self, name=None, binwidth=None, starttime=None) :
+        self.name = name
+        self.binwidth = int(binwidth)
+        self.starttime = starttime
+        self._starts = []
+        self._ends = []
+        self._populations = []
+        self._bins = []
+        self._counts = []
+        self._matrix = None
+
+    def __len__(self) :
+        return len(self._starts)
+
+    def append(self, start=None, end=None, values=None, population=None, bins=None, counts=None) :
+        if values is not None :
+            bins, counts = flow_histogram.parse_pdf(values)
+        self._starts.append(float(start))
+        self._ends.append(float(end))
+        self._populations.append(int(population))
+        self._bins.append(np.asarray(bins, dtype=np.int64))
+        self._counts.append(np.asarray(counts, dtype=np.int64))
+        self._matrix = None
+
+    @property
+    def starts(self) :
+        return np.array(self._starts)
+
+    @property
+    def ends(self) :
+        return np.array(self._ends)
+
+    @property
+    def populations(self) :
+        return np.array(self._populations, dtype=np.int64)
+
+    @property
+    def matrix(self) :
+        # scipy csr matrix, row per interval and column per bin index
+        if self._matrix is None :
+            import scipy.sparse
+            indptr = np.concatenate(([0], np.cumsum([len(b) for b in self._bins]))).astype(np.int64)
+            indices = np.concatenate(self._bins) if self._bins else np.zeros(0, dtype=np.int64)
+            data = np.concatenate(self._counts) if self._counts else np.zeros(0, dtype=np.int64)
+            ncols = int(indices.max()) + 1 if len(indices) else 1
+            self._matrix = scipy.sparse.csr_matrix((data, indices, indptr), shape=(len(self._bins), ncols))
+        return self._matrix
+
+    def percentiles(self, percent) :
+        # percentile per interval (us) for all rows at once, same first bin over the percentage rule as iperf.
+        # The cumulative sum runs over the whole csr data so each row's target is offset by the counts of the rows before it
+        m = self.matrix
+        if not m.nnz :
+            return np.full(m.shape[0], np.nan)
+        cumulative = np.cumsum(m.data)
+        base = np.concatenate(([0], cumulative))[m.indptr[:-1]]
+        targets = base + (float(percent) / 100.0) * self.populations
+        pos = np.searchsorted(cumulative, targets, side='right')
+        empty = m.indptr[1:] == m.indptr[:-1]
+        pos = np.clip(np.minimum(pos, m.indptr[1:] - 1), 0, len(m.indices) - 1)
+        values = (m.indices[pos] * self.binwidth).astype(np.float64)
+        values[empty] = np.nan
+        return values
+
+    def arrays(self) :
+        # the series as named arrays, the csr parts of matrix included, e.g. for histogram_archive.store()
+        m = self.matrix
+        return {'name' : np.array(self.name, dtype=str), 'binwidth' : np.array(self.binwidth), 'starts' : self.starts, 'ends' : self.ends, \
+                'populations' : self.populations, 'indptr' : m.indptr, 'indices' : m.indices, 'data' : m.data}
+
+    def heatmap(self, normalize=True) :
+        # dense interval by bin array, each row scaled to a pdf when normalize is set
+        dense = self.matrix.toarray().astype(np.float64)
+        if normalize :
+            totals = dense.sum(axis=1, keepdims=True)
+            np.divide(dense, totals, out=dense, where=totals > 0)
+        return dense
+
+    def excursions(self, percent=99, factor=2.0) :
+        # intervals whose percentile is more than factor times the run's median of that percentile
+        values = self.percentiles(percent)
+        median = np.nanmedian(values)
+        return np.flatnonzero(values > factor * median)
+
+    def plot_heatmap(self, filename, title=None) :
+        import matplotlib.pyplot as plt
+        dense = self.heatmap()
+        figure = plt.figure(figsize=(18,10))
+        try :
+            extent = [0, dense.shape[1] * self.binwidth / 1000.0, self.ends[-1] if len(self) else 1, self.starts[0] if len(self) else 0]
+            plt.imshow(dense, aspect='auto', interpolation='nearest', extent=extent, cmap='viridis')
+            plt.colorbar(label='pdf')
+            plt.xlabel('time (ms)')
+            plt.ylabel('interval (sec)')
+            plt.title('{} {}'.format(self.name, title or ''))
+            plt.savefig(filename)
+        finally :
+            plt.close(figure)
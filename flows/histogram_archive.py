@@ -0,0 +1,202 @@
+# ---------------------------------------------------------------
+# * Copyright (c) 2018
+# * Broadcom Corporation
+# * All Rights Reserved.
+# *---------------------------------------------------------------
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.  Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the documentation and/or other
+# materials provided with the distribution.  Neither the name of the Broadcom nor the names of
+# contributors may be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Compact binary archive of flow histograms, appendable per run and memory mapped on read
+#
+# Date October 2026
+
+import logging
+import os
+import math
+import hashlib
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# An archive is a directory of three flat little endian files that only ever get appended to
+#
+#   bins.dat    int32 bin indices of all histograms back to back
+#   counts.dat  int64 counts, same layout as the bins
+#   index.dat   one fixed size record per histogram with its metadata and the offset/length
+#               of its bins and counts
+#
+# so reading is just np.memmap of each file and slicing, no text parsing. The data files are
+# written before the index record so a crash never leaves an index entry without its bins.
+# Times are epoch seconds, NaN when unknown, and unknown integers are -1. Per run data that isn't a
+# plain histogram, e.g. a flow's interval histogram series or its device deltas, goes in as a dict
+# of named arrays stored content addressed, <directory>/<kind>/<content hash>.npz, see store().
+class histogram_archive(object):
+    index_dtype = np.dtype([('key', 'S40'), ('name', 'S32'), ('flowname', 'S64'), ('flowid', 'S16'), ('binwidth', '<i4'), \
+                            ('population', '<i8'), ('lci', '<f4'), ('uci', '<f4'), ('lci_val', '<i4'), ('uci_val', '<i4'), \
+                            ('outliers', '<i8'), ('starttime', '<f8'), ('endtime', '<f8'), ('offset', '<i8'), ('length', '<i8')])
+    bins_dtype = np.dtype('<i4')
+    counts_dtype = np.dtype('<i8')
+
+    def __init__(self, directory='histograms') :
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.indexfilename = os.path.join(directory, 'index.dat')
+        self.binsfilename = os.path.join(directory, 'bins.dat')
+        self.countsfilename = os.path.join(directory, 'counts.dat')
+        self._index = None
+        self._bins = None
+        self._counts = None
+
+    def _memmap(self, filename, dtype) :
+        if not os.path.exists(filename) or os.path.getsize(filename) < dtype.itemsize :
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(filename, dtype=dtype, mode='r', shape=(os.path.getsize(filename) // dtype.itemsize,))
+
+    def _reset(self) :
+        self._index = None
+        self._bins = None
+        self._counts = None
+
+    @property
+    def index(self) :
+        if self._index is None :
+            self._index = self._memmap(self.indexfilename, histogram_archive.index_dtype)
+        return self._index
+
+    @property
+    def bins(self) :
+        if self._bins is None :
+            self._bins = self._memmap(self.binsfilename, histogram_archive.bins_dtype)
+        return self._bins
+
+    @property
+    def counts(self) :
+        if self._counts is None :
+            self._counts = self._memmap(self.countsfilename, histogram_archive.counts_dtype)
+        return self._counts
+
+    def __len__(self) :
+        return len(self.index)
+
+    @staticmethod
+    def _epoch(t) :
+        return t.timestamp() if t is not None else math.nan
+
+    @staticmethod
+    def _int(value) :
+        return int(value) if value is not None else -1
+
+    @staticmethod
+    def _float(value) :
+        return float(value) if value is not None else math.nan
+
+    @staticmethod
+    def _check_width(field, value) :
+        # the index fields are fixed width, a longer value would be truncated and collide with others
+        width = histogram_archive.index_dtype[field].itemsize
+        if len(value.encode()) > width :
+            raise ValueError('histogram archive {} {!r} is longer than {} bytes'.format(field, value, width))
+
+    def append(self, histograms, flowname=None, flowid=None) :
+        if not isinstance(histograms, (list, tuple)) :
+            histograms = [histograms]
+        histogram_archive._check_width('flowname', flowname or '')
+        histogram_archive._check_width('flowid', str(flowid or ''))
+        for h in histograms :
+            histogram_archive._check_width('name', h.name or '')
+        offset = os.path.getsize(self.binsfilename) // histogram_archive.bins_dtype.itemsize if os.path.exists(self.binsfilename) else 0
+        records = np.zeros(len(histograms), dtype=histogram_archive.index_dtype)
+        with open(self.binsfilename, 'ab') as binsfd, open(self.countsfilename, 'ab') as countsfd :
+            for ix, h in enumerate(histograms) :
+                binsfd.write(np.ascontiguousarray(h.bins, dtype=histogram_archive.bins_dtype).tobytes())
+                countsfd.write(np.ascontiguousarray(h.counts, dtype=histogram_archive.counts_dtype).tobytes())
+                records[ix] = (h.content_hash, h.name or '', flowname or '', str(flowid or ''), h.binwidth, h.population, \
+                               histogram_archive._float(h.lci), histogram_archive._float(h.uci), histogram_archive._int(h.lci_val), histogram_archive._int(h.uci_val), \
+                               histogram_archive._int(h.outliers), histogram_archive._epoch(h.starttime), histogram_archive._epoch(h.endtime), offset, len(h.bins))
+                offset += len(h.bins)
+        with open(self.indexfilename, 'ab') as indexfd :
+            indexfd.write(records.tobytes())
+        logging.debug('Archived {} histograms to {}'.format(len(histograms), self.directory))
+        self._reset()
+
+    def contains(self, key, flowname=None) :
+        match = self.index['key'] == key.encode()
+        if flowname is not None :
+            match &= self.index['flowname'] == flowname.encode()
+        return bool(np.any(match))
+
+    def select(self, name=None, flowname=None, flowid=None) :
+        # indices of the matching histograms, vectorized over the memory mapped index
+        match = np.ones(len(self.index), dtype=bool)
+        if name is not None :
+            match &= self.index['name'] == name.encode()
+        if flowname is not None :
+            match &= self.index['flowname'] == flowname.encode()
+        if flowid is not None :
+            match &= self.index['flowid'] == flowid.encode()
+        return np.flatnonzero(match)
+
+    def arrays(self, ix) :
+        # zero copy views of the bins and counts of histogram ix
+        record = self.index[ix]
+        start = int(record['offset'])
+        stop = start + int(record['length'])
+        return self.bins[start:stop], self.counts[start:stop]
+
+    def histogram(self, ix) :
+        from flows import flow_histogram
+        from datetime import datetime, timezone
+        record = self.index[ix]
+        bins, counts = self.arrays(ix)
+        def optional(value, missing) :
+            return None if value == missing else value
+        def when(t) :
+            return None if math.isnan(t) else datetime.fromtimestamp(t, timezone.utc).astimezone()
+        return flow_histogram(name=record['name'].decode(), bins=np.array(bins), counts=np.array(counts), binwidth=int(record['binwidth']), \
+                              population=int(record['population']), starttime=when(record['starttime']), endtime=when(record['endtime']), \
+                              outliers=optional(int(record['outliers']), -1), lci=(None if math.isnan(record['lci']) else float(record['lci'])), \
+                              uci=(None if math.isnan(record['uci']) else float(record['uci'])), lci_val=optional(int(record['lci_val']), -1), \
+                              uci_val=optional(int(record['uci_val']), -1))
+
+    def histograms(self, name=None, flowname=None, flowid=None) :
+        return [self.histogram(ix) for ix in self.select(name=name, flowname=flowname, flowid=flowid)]
+
+    @staticmethod
+    def content_hash(arrays) :
+        sha = hashlib.sha1()
+        for key in sorted(arrays) :
+            value = np.ascontiguousarray(arrays[key])
+            sha.update('{}:{}:{}:'.format(key, value.dtype.str, value.shape).encode())
+            sha.update(value.tobytes())
+        return sha.hexdigest()
+
+    def store(self, kind, arrays) :
+        # arrays is a dict of name to numeric or string array, returns the content hash it's stored under
+        key = histogram_archive.content_hash(arrays)
+        directory = os.path.join(self.directory, kind)
+        filename = os.path.join(directory, '{}.npz'.format(key))
+        if not os.path.exists(filename) :
+            os.makedirs(directory, exist_ok=True)
+            np.savez_compressed(filename, **arrays)
+            logging.debug('Archived {} {} to {}'.format(kind, key, directory))
+        return key
+
+    def load(self, kind, key) :
+        with np.load(os.path.join(self.directory, kind, '{}.npz'.format(key))) as data :
+            return {name : data[name] for name in data.files}
@@ -0,0 +1,169 @@
+# ---------------------------------------------------------------
+# * Copyright (c) 2018
+# * Broadcom Corporation
+# * All Rights Reserved.
+# *---------------------------------------------------------------
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.  Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the documentation and/or other
+# materials provided with the distribution.  Neither the name of the Broadcom nor the names of
+# contributors may be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Histogram native two sample statistics, i.e. computed from bin counts without expanding samples
+#
+# Date October 2026
+
+import logging
+import os
+import collections
+import concurrent.futures
+import hashlib
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Use the exact KS distribution when neither population is larger than this, scipy's ks_2samp
+# auto method uses the same max(n1, n2) <= 10000 rule
+KS_EXACT_LIMIT = 10000
+
+# The histograms are duck typed, anything with the integer arrays bins and counts plus binwidth
+# works, e.g. flow_histogram. A bin index ix holds the samples with a value up to ix * binwidth (us)
+# so the values from histograms with different bin widths are put on one grid before comparing
+def _values(h) :
+    return h.bins.astype(np.float64) * float(h.binwidth)
+
+def aligned_cdfs(h1, h2) :
+    x1 = _values(h1)
+    x2 = _values(h2)
+    grid = np.union1d(x1, x2)
+    c1 = np.cumsum(h1.counts)
+    c2 = np.cumsum(h2.counts)
+    n1 = c1[-1]
+    n2 = c2[-1]
+    # cumulative count at or below each grid point, zero before the first bin
+    cdf1 = np.concatenate(([0], c1))[np.searchsorted(x1, grid, side='right')] / float(n1)
+    cdf2 = np.concatenate(([0], c2))[np.searchsorted(x2, grid, side='right')] / float(n2)
+    return grid, cdf1, cdf2, int(n1), int(n2)
+
+def ks_2hist(h1, h2, method='auto') :
+    from scipy import stats
+    grid, cdf1, cdf2, n1, n2 = aligned_cdfs(h1, h2)
+    d = float(np.max(np.abs(cdf1 - cdf2)))
+    if method == 'exact' or (method == 'auto' and max(n1, n2) <= KS_EXACT_LIMIT) :
+        # small populations, expanding is cheap and gives scipy's exact p-value
+        s1 = np.repeat(_values(h1), h1.counts)
+        s2 = np.repeat(_values(h2), h2.counts)
+        result = stats.ks_2samp(s1, s2, method='exact')
+        return float(result.statistic), float(result.pvalue)
+    en = (n1 * n2) / float(n1 + n2)
+    p = float(np.clip(stats.kstwo.sf(d, np.round(en)), 0, 1))
+    return d, p
+
+def wasserstein(h1, h2) :
+    # earth mover's distance (us), the area between the two cdfs
+    grid, cdf1, cdf2, n1, n2 = aligned_cdfs(h1, h2)
+    return float(np.sum(np.abs(cdf1 - cdf2)[:-1] * np.diff(grid)))
+
+def total_variation(h1, h2) :
+    grid, cdf1, cdf2, n1, n2 = aligned_cdfs(h1, h2)
+    pmf1 = np.diff(cdf1, prepend=0)
+    pmf2 = np.diff(cdf2, prepend=0)
+    return float(0.5 * np.sum(np.abs(pmf1 - pmf2)))
+
+def compare(h1, h2, method='auto') :
+    d, p = ks_2hist(h1, h2, method=method)
+    return {'ks_d' : d, 'ks_p' : p, 'wasserstein' : wasserstein(h1, h2), 'tv' : total_variation(h1, h2)}
+
+# Pairwise KS table, D values are in condensed distance matrix order, i.e. what scipy's linkage expects,
+# where pair (i,j) with i < j is at index n*i - i*(i+1)/2 + (j-i-1). The pairs still to compute are fanned
+# out to a process pool in contiguous chunks, the histograms are handed to each worker once as compact
+# bin arrays. With a cache only the pairs not seen before get computed, e.g. those of newly added runs
+hist_bins = collections.namedtuple('hist_bins', ['bins', 'counts', 'binwidth'])
+KS_PARALLEL_MIN_PAIRS = 1000
+_pool_histograms = None
+
+def _pool_init(histograms) :
+    global _pool_histograms
+    _pool_histograms = histograms
+
+def condensed_index(n, i, j) :
+    return n * i - (i * (i + 1)) // 2 + (j - i - 1)
+
+def content_hash(h) :
+    sha = hashlib.sha1()
+    sha.update('{}:{}:'.format(h.name, h.binwidth).encode())
+    sha.update(np.ascontiguousarray(h.bins, dtype=np.int64).tobytes())
+    sha.update(np.ascontiguousarray(h.counts, dtype=np.int64).tobytes())
+    return sha.hexdigest()
+
+def ks_pairs(rows, cols, histograms=None, method='auto') :
+    if histograms is None :
+        histograms = _pool_histograms
+    d = np.zeros(len(rows))
+    p = np.zeros(len(rows))
+    for ix, (row, col) in enumerate(zip(rows, cols)) :
+        d[ix], p[ix] = ks_2hist(histograms[row], histograms[col], method=method)
+    return d, p
+
+def ks_table(histograms, workers=None, method='auto', name=None, cache=None) :
+    n = len(histograms)
+    total = (n * (n - 1)) // 2
+    dvals = np.zeros(total)
+    pvals = np.zeros(total)
+    rows, cols = np.triu_indices(n, k=1)
+    todo = np.arange(total)
+    if cache is not None :
+        keys = [h.content_hash for h in histograms]
+        positions = collections.defaultdict(list)
+        for ix, key in enumerate(keys) :
+            positions[key].append(ix)
+        known = []
+        for (key1, key2), (d, p) in cache.lookup(keys, method=method).items() :
+            # identical histograms share a key so a cached pair can land on more than one cell
+            for i in positions[key1] :
+                for j in positions[key2] :
+                    if i != j :
+                        known.append((condensed_index(n, min(i, j), max(i, j)), d, p))
+        if known :
+            known = np.array(known)
+            index = known[:, 0].astype(np.int64)
+            dvals[index] = known[:, 1]
+            pvals[index] = known[:, 2]
+            todo = np.setdiff1d(todo, index)
+        logging.info('{} KS table {} of {} pairs cached'.format(name, total - len(todo), total))
+    if not len(todo) :
+        return dvals, pvals
+
+    hists = [hist_bins(h.bins, h.counts, h.binwidth) for h in histograms]
+    if workers is None :
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(todo) < KS_PARALLEL_MIN_PAIRS :
+        dvals[todo], pvals[todo] = ks_pairs(rows[todo], cols[todo], histograms=hists, method=method)
+    else :
+        chunks = np.array_split(todo, min(len(todo), workers * 4))
+        logging.info('{} KS table {} pairs in {} chunks using {} workers'.format(name, len(todo), len(chunks), workers))
+        done = 0
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_pool_init, initargs=(hists,)) as pool :
+            futures = {pool.submit(ks_pairs, rows[chunk], cols[chunk], None, method) : chunk for chunk in chunks}
+            for future in concurrent.futures.as_completed(futures) :
+                chunk = futures[future]
+                dvals[chunk], pvals[chunk] = future.result()
+                done += len(chunk)
+                logging.info('{} KS table progress {}/{} pairs ({:.0f}%)'.format(name, done, len(todo), 100.0 * done / len(todo)))
+
+    if cache is not None :
+        cache.store([(keys[i], keys[j], d, p) for i, j, d, p in zip(rows[todo], cols[todo], dvals[todo], pvals[todo])], method=method)
+    return dvals, pvals
@@ -0,0 +1,74 @@
+# ---------------------------------------------------------------
+# * Copyright (c) 2018
+# * Broadcom Corporation
+# * All Rights Reserved.
+# *---------------------------------------------------------------
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.  Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the documentation and/or other
+# materials provided with the distribution.  Neither the name of the Broadcom nor the names of
+# contributors may be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# Import time guard for flows, fails when importing it gets slow or pulls in the plotting/analysis stack
+#
+# Date October 2026
+
+import argparse
+import subprocess
+import sys
+import os
+
+# The orchestration scripts only need flows to send traffic, scipy, matplotlib and tkinter are
+# loaded on first use by the analysis and plot paths. Each check runs in a fresh interpreter
+# with -X importtime, which reports the cumulative import time of every module in us.
+HEAVY_MODULES = ('scipy', 'matplotlib', 'tkinter', 'pyarrow')
+
+def import_profile(module, python=sys.executable) :
+    code = 'import sys, {0}; print(" ".join(sorted(set(m.split(".")[0] for m in sys.modules) & set({1}))))'.format(module, repr(HEAVY_MODULES))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([os.path.dirname(os.path.abspath(__file__))] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    result = subprocess.run([python, '-X', 'importtime', '-c', code], capture_output=True, text=True, env=env)
+    if result.returncode :
+        raise RuntimeError('import {} failed: {}'.format(module, result.stderr.strip().splitlines()[-1:]))
+    times = {}
+    for line in result.stderr.splitlines() :
+        if line.startswith('import time:') and '|' in line :
+            fields = line[len('import time:'):].split('|')
+            try :
+                times[fields[2].strip()] = int(fields[1])
+            except ValueError :
+                pass
+    return times.get(module, 0) / 1e6, result.stdout.split(), times
+
+if __name__ == '__main__' :
+    parser = argparse.ArgumentParser(description='Check the import time budget of the flows modules')
+    parser.add_argument('-b','--budget', type=float, default=0.5, required=False, help='import time budget in seconds')
+    parser.add_argument('-r','--repeat', type=int, default=3, required=False, help='best of this many fresh interpreters')
+    parser.add_argument('-t','--top', type=int, default=10, required=False, help='list the slowest imports')
+    parser.add_argument('modules', nargs='*', default=['flows', 'ssh_nodes'], help='modules to check')
+    args = parser.parse_args()
+    failed = False
+    for module in args.modules :
+        profiles = [import_profile(module) for ix in range(args.repeat)]
+        seconds, heavy, times = min(profiles, key=lambda profile : profile[0])
+        ok = seconds <= args.budget and not heavy
+        failed |= not ok
+        print('{} import {:.3f}s (budget {:.3f}s){} {}'.format(module, seconds, args.budget, ' heavy modules: ' + ','.join(heavy) if heavy else '', 'ok' if ok else 'FAIL'))
+        if not ok :
+            for name, us in sorted(times.items(), key=lambda item : -item[1])[:args.top] :
+                print('  {:8.3f}s {}'.format(us / 1e6, name.strip()))
+    sys.exit(1 if failed else 0)
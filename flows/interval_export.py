@@ -0,0 +1,215 @@
+# ---------------------------------------------------------------
+# * Copyright (c) 2018
+# * Broadcom Corporation
+# * All Rights Reserved.
+# *---------------------------------------------------------------
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.  Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the documentation and/or other
+# materials provided with the distribution.  Neither the name of the Broadcom nor the names of
+# contributors may be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# Streaming long format export of the per interval iperf samples, one typed row per metric value
+#
+# Date October 2026
+
+import logging
+import os
+import csv
+import time
+import asyncio
+import concurrent.futures
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# The schema is fixed so files from different runs, flows and protocols load the same way, e.g.
+#
+#   time,flow,flowid,side,stream,start,end,metric,value
+#   1792390810.12,flowA,0x1f2e3d4c,rx,4,0.00,0.50,throughput,10513440
+#
+# Rows are buffered on the event loop and written by a single writer thread every flush_interval
+# seconds or max_rows rows, whichever comes first, so a crash loses at most that much. The
+# formats are csv, or arrow (an arrow IPC stream, readable up to the last batch written) when
+# pyarrow is installed. format 'auto' picks arrow for .arrow file names. Both append to what an
+# earlier run exported, csv by appending rows and arrow, whose stream can't be reopened, by
+# writing the next part file, run.arrow then run.1.arrow, run.2.arrow, ... which load() reads
+# back in order.
+COLUMNS = ('time', 'flow', 'flowid', 'side', 'stream', 'start', 'end', 'metric', 'value')
+DTYPES = (np.float64, object, object, object, np.int64, np.float64, np.float64, object, np.float64)
+
+def _interval(text) :
+    # iperf interval text, e.g. ' 0.00-0.50' or '10.00-10.50'
+    try :
+        start, end = text.split('-', 1)
+        return float(start), float(end)
+    except (AttributeError, ValueError) :
+        return float('nan'), float('nan')
+
+def _parts(filename) :
+    # the existing arrow part files of filename, oldest first
+    base, ext = os.path.splitext(filename)
+    parts = [filename] if os.path.exists(filename) else []
+    n = 1
+    while os.path.exists('{}.{}{}'.format(base, n, ext)) :
+        parts.append('{}.{}{}'.format(base, n, ext))
+        n += 1
+    return parts
+
+def _number(text) :
+    try :
+        return float(text)
+    except (TypeError, ValueError) :
+        return float('nan')
+
+class _csv_writer(object):
+    def __init__(self, filename) :
+        exists = os.path.exists(filename) and os.path.getsize(filename) > 0
+        self.filename = filename
+        self.fid = open(filename, 'a', newline='')
+        self.writer = csv.writer(self.fid)
+        if not exists :
+            self.writer.writerow(COLUMNS)
+
+    def write(self, rows) :
+        self.writer.writerows(rows)
+        self.fid.flush()
+        return self.fid
+
+    def close(self) :
+        self.fid.close()
+
+class _arrow_writer(object):
+    def __init__(self, filename) :
+        import pyarrow as pa
+        self.pa = pa
+        self.schema = pa.schema([('time', pa.float64()), ('flow', pa.string()), ('flowid', pa.string()), ('side', pa.string()), ('stream', pa.int64()), \
+                                 ('start', pa.float64()), ('end', pa.float64()), ('metric', pa.string()), ('value', pa.float64())])
+        parts = _parts(filename)
+        if parts :
+            base, ext = os.path.splitext(filename)
+            filename = '{}.{}{}'.format(base, len(parts), ext)
+        self.filename = filename
+        self.fid = open(filename, 'xb')
+        self.writer = pa.ipc.new_stream(self.fid, self.schema)
+
+    def write(self, rows) :
+        columns = list(zip(*rows))
+        self.writer.write_batch(self.pa.record_batch([self.pa.array(column, type=field.type) for column, field in zip(columns, self.schema)], schema=self.schema))
+        self.fid.flush()
+        return self.fid
+
+    def close(self) :
+        self.writer.close()
+        self.fid.close()
+
+class interval_exporter(object):
+    def __init__(self, filename, format='auto', flush_interval=1.0, max_rows=4096, fsync=True) :
+        if format == 'auto' :
+            format = 'arrow' if filename.endswith('.arrow') else 'csv'
+        self.filename = filename
+        self.format = format
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.fsync = fsync
+        self.rows = []
+        self.rowcount = 0
+        self._timer = None
+        self._closed = False
+        if format == 'arrow' :
+            try :
+                self._writer = _arrow_writer(filename)
+            except ImportError :
+                logging.warning('pyarrow not available, exporting {} as csv'.format(filename))
+                self.format = 'csv'
+                self._writer = _csv_writer(filename)
+        else :
+            self._writer = _csv_writer(filename)
+        # one writer thread keeps the batches in order
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        logging.info('Exporting interval samples to {} ({})'.format(self._writer.filename, self.format))
+
+    def add(self, flow, flowid, side, stream, start, end, metrics, t=None) :
+        # metrics is a dict of metric name to value, one row each, t defaults to now
+        if self._closed :
+            return
+        now = time.time() if t is None else t
+        stream = int(stream) if stream is not None else -1
+        for metric, value in metrics.items() :
+            self.rows.append((now, flow, flowid, side, stream, start, end, metric, _number(value)))
+        if len(self.rows) >= self.max_rows :
+            self.flush()
+        elif self._timer is None :
+            try :
+                self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self.flush)
+            except RuntimeError :
+                pass
+
+    def add_match(self, flow, flowid, side, m, metrics) :
+        # m is an iperf interval regex match with stream and timestamp groups
+        start, end = _interval(m.group('timestamp'))
+        self.add(flow, flowid, side, m.group('stream'), start, end, {metric : m.group(metric) for metric in metrics})
+
+    def _write(self, rows) :
+        fid = self._writer.write(rows)
+        if self.fsync :
+            os.fsync(fid.fileno())
+
+    def flush(self) :
+        if self._timer is not None :
+            self._timer.cancel()
+            self._timer = None
+        if not self.rows :
+            return None
+        rows, self.rows = self.rows, []
+        self.rowcount += len(rows)
+        future = self._executor.submit(self._write, rows)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future) :
+        if future.exception() :
+            logging.error('interval export to {} failed: {}'.format(self.filename, repr(future.exception())))
+
+    def close(self) :
+        if self._closed :
+            return
+        self.flush()
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        self._writer.close()
+        logging.info('Exported {} interval rows to {}'.format(self.rowcount, self._writer.filename))
+
+def load(filename) :
+    # returns a dict of column name to numpy array, an arrow export's part files included
+    if filename.endswith('.arrow') :
+        try :
+            import pyarrow as pa
+        except ImportError :
+            pa = None
+        if pa :
+            tables = []
+            for part in _parts(filename) or [filename] :
+                with open(part, 'rb') as fid :
+                    tables.append(pa.ipc.open_stream(fid).read_all())
+            table = pa.concat_tables(tables)
+            return {name : table.column(name).to_numpy() for name in COLUMNS}
+    with open(filename, newline='') as fid :
+        reader = csv.reader(fid)
+        header = next(reader)
+        columns = list(zip(*reader)) or [()] * len(header)
+    return {name : np.asarray(column, dtype=dtype) for name, column, dtype in zip(COLUMNS, columns, DTYPES)}
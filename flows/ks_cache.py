@@ -0,0 +1,62 @@
+# ---------------------------------------------------------------
+# * Copyright (c) 2018
+# * Broadcom Corporation
+# * All Rights Reserved.
+# *---------------------------------------------------------------
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.  Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the documentation and/or other
+# materials provided with the distribution.  Neither the name of the Broadcom nor the names of
+# contributors may be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# On disk cache of two sample KS results keyed by histogram content
+#
+# Date October 2026
+
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# Pair results are stored once per unordered pair of histogram content hashes (see
+# histogram_stats.content_hash) so a campaign that grows by a few runs a day only
+# computes the pairs involving the new runs
+class ks_cache(object):
+
+    def __init__(self, filename='ks_cache.db') :
+        self.filename = filename
+        self.db = sqlite3.connect(filename)
+        self.db.execute('CREATE TABLE IF NOT EXISTS ks_pairs (h1 TEXT NOT NULL, h2 TEXT NOT NULL, method TEXT NOT NULL, d REAL NOT NULL, p REAL NOT NULL, PRIMARY KEY (h1, h2, method))')
+        self.db.execute('CREATE TEMP TABLE lookup_keys (key TEXT PRIMARY KEY)')
+        self.db.commit()
+        logging.debug('KS cache {} opened'.format(filename))
+
+    def lookup(self, keys, method='auto') :
+        with self.db :
+            self.db.execute('DELETE FROM lookup_keys')
+            self.db.executemany('INSERT OR IGNORE INTO lookup_keys (key) VALUES (?)', [(key,) for key in keys])
+            rows = self.db.execute('SELECT h1, h2, d, p FROM ks_pairs JOIN lookup_keys a ON h1 = a.key JOIN lookup_keys b ON h2 = b.key WHERE method = ?', (method,)).fetchall()
+        return {(h1, h2) : (d, p) for h1, h2, d, p in rows}
+
+    def store(self, pairs, method='auto') :
+        # pairs is an iterable of (key1, key2, d, p), keys are stored sorted as KS is symmetric
+        rows = [(min(k1, k2), max(k1, k2), method, float(d), float(p)) for k1, k2, d, p in pairs]
+        with self.db :
+            self.db.executemany('INSERT OR REPLACE INTO ks_pairs (h1, h2, method, d, p) VALUES (?, ?, ?, ?, ?)', rows)
+        logging.debug('KS cache {} stored {} pairs'.format(self.filename, len(rows)))
+
+    def close(self) :
+        self.db.close()
@@ -0,0 +1,135 @@
+# ---------------------------------------------------------------
+# * Copyright (c) 2018
+# * Broadcom Corporation
+# * All Rights Reserved.
+# *---------------------------------------------------------------
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.  Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the documentation and/or other
+# materials provided with the distribution.  Neither the name of the Broadcom nor the names of
+# contributors may be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# KS table summary report, an html index over the per flow heatmaps and cdf overlays with pair plots on demand
+#
+# Date October 2026
+
+import logging
+import os
+import glob
+import json
+import html
+import argparse
+import asyncio
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Each compute_ks_table(plot=True) leaves a <ks_flow_name>.ks.json sidecar next to its images with the
+# condensed D/p values and the cluster labels. The index is rebuilt from all the sidecars in the
+# directory. Under each heatmap image is a grid with one cell per pair built from the sidecar values,
+# not from image coordinates, and a click on a cell shows D/p for that pair and links its pair plot,
+# which only exists once rendered, i.e. iperf_flow.plot_ks_pair() or this module's command line from an archive.
+def write_summary(directory, flowname, name, dvalues, pvalues, clusters, heatmap, overlay, pairpattern, critical_p) :
+    n = int(len(clusters))
+    summary = {'flow' : flowname, 'name' : name, 'n' : n, 'critical_p' : critical_p, 'heatmap' : heatmap, 'overlay' : overlay, 'pairs' : pairpattern, \
+               'clusters' : [int(c) for c in clusters], 'd' : np.round(dvalues, 5).tolist(), 'p' : [float('{:.3g}'.format(p)) for p in pvalues]}
+    filename = os.path.join(directory, 'ks_{}_{}.ks.json'.format(flowname, name))
+    with open(filename, 'w') as fid :
+        json.dump(summary, fid)
+    return filename
+
+_script = '''
+<script>
+function kspair(id, i, j) {
+  var s = window.kstables[id];
+  var a = Math.min(i, j), b = Math.max(i, j);
+  var k = s.n * a - a * (a + 1) / 2 + (b - a - 1);
+  var link = s.pairs.replace(/\\{i\\}/g, a).replace(/\\{j\\}/g, b);
+  document.getElementById(id + '_pair').innerHTML = 'runs ' + a + ',' + b + ' D=' + s.d[k] + ' p=' + s.p[k] +
+    ' <a href="' + link + '">pair plot</a> (render with plot_ks_pair(\\'' + s.name + '\\', ' + a + ', ' + b + ') if missing)';
+}
+// one cell per pair, shaded by D and marked x where p <= critical_p, a click selects that pair
+function ksgrid(id) {
+  var s = window.kstables[id];
+  var rows = [];
+  for (var i = 0; i < s.n; i++) {
+    var cells = [];
+    for (var j = 0; j < s.n; j++) {
+      if (i == j) { cells.push('<td></td>'); continue; }
+      var a = Math.min(i, j), b = Math.max(i, j);
+      var k = s.n * a - a * (a + 1) / 2 + (b - a - 1);
+      var shade = Math.round(255 * (1 - Math.min(1, s.d[k])));
+      var mark = (s.p[k] <= s.critical_p) ? 'x' : '';
+      cells.push('<td title="runs ' + a + ',' + b + '" style="background:rgb(255,' + shade + ',' + shade + ');cursor:pointer" onclick="kspair(\\'' + id + '\\',' + i + ',' + j + ')">' + mark + '</td>');
+    }
+    rows.push('<tr><th>' + i + '</th>' + cells.join('') + '</tr>');
+  }
+  document.getElementById(id + '_grid').innerHTML = '<table style="border-collapse:collapse;font-size:8px">' + rows.join('') + '</table>';
+}
+</script>
+'''
+
+def write_index(directory) :
+    summaries = []
+    for filename in sorted(glob.glob(os.path.join(directory, '*.ks.json'))) :
+        with open(filename) as fid :
+            summaries.append(json.load(fid))
+    indexfilename = os.path.join(directory, 'index.html')
+    with open(indexfilename, 'w') as fid :
+        fid.write('<html><head><title>KS summary</title></head><body>\n')
+        fid.write(_script)
+        fid.write('<script>window.kstables = {};</script>\n')
+        for ix, s in enumerate(summaries) :
+            id = 'ks{}'.format(ix)
+            fails = sum(1 for p in s['p'] if p <= s['critical_p'])
+            fid.write('<h2>{} {}</h2>\n'.format(html.escape(s['flow']), html.escape(s['name'])))
+            fid.write('<p>{} runs, {} of {} pairs with p &lt;= {}, clusters {}</p>\n'.format(s['n'], fails, len(s['p']), s['critical_p'], html.escape(str(s['clusters']))))
+            fid.write('<script>window.kstables["{}"] = {};</script>\n'.format(id, json.dumps({k : s[k] for k in ['n', 'd', 'p', 'pairs', 'name', 'critical_p']})))
+            fid.write('<img src="{}" width="100%">\n'.format(html.escape(s['heatmap'])))
+            fid.write('<div id="{0}_grid"></div><div id="{0}_pair"></div><script>ksgrid("{0}");</script>\n'.format(id))
+            fid.write('<img src="{}" width="100%">\n'.format(html.escape(s['overlay'])))
+        fid.write('</body></html>\n')
+    logging.info('KS summary index {} ({} tables)'.format(indexfilename, len(summaries)))
+    return indexfilename
+
+def plot_pair_from_archive(archivedir, flowname, name, i, j, directory='.', title=None, gnuplot=None) :
+    # render one pair from the histograms dump_stats archived, runs are numbered in archive order
+    import histogram_archive
+    from flows import flow_histogram
+    from plot_workers import gnuplot_pool
+    if gnuplot :
+        flow_histogram.gnuplot = gnuplot
+    archive = histogram_archive.histogram_archive(archivedir)
+    histograms = archive.histograms(name=name, flowname=flowname)
+    for index, h in enumerate(histograms) :
+        h.ks_index = index
+    async def plot() :
+        await flow_histogram.plot_two_sample_ks(h1=histograms[min(i, j)], h2=histograms[max(i, j)], flowname=flowname, title=title, directory=directory)
+        await gnuplot_pool.close_all()
+    asyncio.run(plot())
+
+if __name__ == '__main__' :
+    parser = argparse.ArgumentParser(description='Render a two sample KS pair plot from a histogram archive')
+    parser.add_argument('-a','--archive', type=str, required=True, help='histogram archive directory, e.g. <output>/histograms')
+    parser.add_argument('-f','--flow', type=str, required=True, help='flow name')
+    parser.add_argument('-n','--name', type=str, required=True, help='histogram name, e.g. T8')
+    parser.add_argument('-o','--output_directory', type=str, required=False, default='.', help='output directory')
+    parser.add_argument('-T','--title', type=str, default=None, required=False, help='title for graphs')
+    parser.add_argument('-g','--gnuplot', type=str, default=None, required=False, help='gnuplot binary')
+    parser.add_argument('pair', type=int, nargs=2, help='the two run indices')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    plot_pair_from_archive(args.archive, args.flow, args.name, args.pair[0], args.pair[1], directory=args.output_directory, title=args.title, gnuplot=args.gnuplot)
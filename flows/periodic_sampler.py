@@ -0,0 +1,209 @@
+# ---------------------------------------------------------------
+# * Copyright (c) 2018
+# * Broadcom Corporation
+# * All Rights Reserved.
+# *---------------------------------------------------------------
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.  Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the documentation and/or other
+# materials provided with the distribution.  Neither the name of the Broadcom nor the names of
+# contributors may be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# Periodic device sampling over one long lived remote shell per host and command
+#
+# Date October 2026
+
+import logging
+import asyncio
+import subprocess
+import time
+import math
+import re
+import uuid
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# The remote side is a shell loop that runs the command once per line read from stdin, bracketed
+# by marker lines carrying the sample number:
+#
+#   while read n; do echo M:b:$n; { <cmd>; } </dev/null 2>&1; echo M:e:$n; done
+#
+# with the command's stdin on /dev/null, a command reading stdin, e.g. ush or cat, would eat the
+# tick lines otherwise. A sample costs a write to the open channel instead of an ssh spawn. The
+# schedule is kept here on absolute times anchor + k * period, where anchor is e.g. the flow start,
+# so samples don't drift and share the time.time() base of the iperf interval rows (see
+# interval_export). A tick due while the previous sample is still running is skipped and counted
+# in missed. The sample text goes through the parser, a callable returning a dict of metric name
+# to number, into a sample_series.
+
+_number = re.compile(r'^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$')
+
+def key_values(text) :
+    # name value, name: value and name=value pairs anywhere in the text, e.g. wl counters output
+    metrics = {}
+    tokens = text.replace(':', ' ').replace('=', ' ').split()
+    for name, value in zip(tokens, tokens[1:]) :
+        if not _number.match(name) and _number.match(value) :
+            metrics[name] = float(value)
+    return metrics
+
+def regex_parser(pattern) :
+    # parser from a regex with named groups, every match's groups become metrics
+    regex = re.compile(pattern, re.MULTILINE)
+    def parser(text) :
+        metrics = {}
+        for m in regex.finditer(text) :
+            for name, value in m.groupdict().items() :
+                if value is not None :
+                    metrics[name] = float(value)
+        return metrics
+    return parser
+
+parsers = {'raw' : None, 'key_values' : key_values}
+
+class sample_series(object):
+    def __init__(self, name=None) :
+        self.name = name
+        self.times = []
+        self.latencies = []
+        self.samples = []
+        self.raw = []
+        self._arrays = None
+
+    def __len__(self) :
+        return len(self.times)
+
+    def append(self, t, metrics, latency=None, raw=None) :
+        self.times.append(t)
+        self.latencies.append(latency)
+        self.samples.append(metrics)
+        if raw is not None :
+            self.raw.append(raw)
+        self._arrays = None
+
+    @property
+    def metrics(self) :
+        names = {}
+        for sample in self.samples :
+            names.update(dict.fromkeys(sample))
+        return list(names)
+
+    def arrays(self) :
+        # sample times plus one float column per metric, NaN where a sample lacked the metric
+        if self._arrays is None :
+            columns = {'time' : np.asarray(self.times, dtype=np.float64)}
+            for name in self.metrics :
+                columns[name] = np.array([sample.get(name, np.nan) for sample in self.samples], dtype=np.float64)
+            self._arrays = columns
+        return self._arrays
+
+class periodic_sampler(object):
+    def __init__(self, node, cmd, period=1.0, parser='key_values', name=None, start_at=None, exporter=None, keep_raw=False) :
+        self.node = node
+        self.cmd = cmd
+        self.period = float(period)
+        self.parser = parsers[parser] if isinstance(parser, str) else parser
+        self.name = name or cmd
+        self.start_at = start_at
+        self.exporter = exporter
+        self.keep_raw = keep_raw
+        self.series = sample_series(name=self.name)
+        self.missed = 0
+        self._process = None
+        self._tasks = []
+        self._outstanding = {}
+
+    async def start(self) :
+        # imported here, ssh_nodes is where the node and its ssh command come from
+        from ssh_nodes import ssh_session
+        self.marker = '__sampler_{}__'.format(uuid.uuid4().hex[:12])
+        script = 'while read n; do echo {0}:b:$n; {{ {1}\n}} </dev/null 2>&1; echo {0}:e:$n; done'.format(self.marker, self.cmd)
+        session = ssh_session(name=self.node.name, hostname=self.node.ipaddr, node=self.node)
+        sshcmd = await session.sshcmd(script)
+        logging.info('{} sampling "{}" every {} sec'.format(self.node.name, self.cmd, self.period))
+        self._process = await asyncio.create_subprocess_exec(*sshcmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        self.anchor = self.start_at if self.start_at is not None else time.time()
+        self._tasks = [asyncio.ensure_future(self._reader()), asyncio.ensure_future(self._ticker())]
+
+    async def _ticker(self) :
+        k = max(0, math.ceil((time.time() - self.anchor) / self.period))
+        while self._process.returncode is None :
+            due = self.anchor + k * self.period
+            await asyncio.sleep(max(0, due - time.time()))
+            if self._outstanding :
+                self.missed += 1
+            else :
+                self._outstanding[k] = (due, time.time())
+                try :
+                    self._process.stdin.write('{}\n'.format(k).encode())
+                    await self._process.stdin.drain()
+                except (BrokenPipeError, ConnectionResetError) :
+                    break
+            k += 1
+
+    async def _reader(self) :
+        lines = []
+        while True :
+            line = await self._process.stdout.readline()
+            if not line :
+                break
+            text = line.decode('utf-8', errors='replace')
+            pos = text.find(self.marker)
+            if pos < 0 :
+                lines.append(text)
+                continue
+            if pos :
+                lines.append(text[:pos])
+            fields = text[pos + len(self.marker) + 1:].strip().split(':')
+            if fields[0] == 'b' :
+                lines = []
+            elif fields[0] == 'e' and int(fields[1]) in self._outstanding :
+                due, sent = self._outstanding.pop(int(fields[1]))
+                self._sample(due, time.time() - sent, ''.join(lines))
+                lines = []
+        logging.debug('{} sampler "{}" closed'.format(self.node.name, self.cmd))
+
+    def _sample(self, due, latency, raw) :
+        try :
+            metrics = self.parser(raw) if self.parser else {}
+        except Exception as exc :
+            logging.warning('{} sampler "{}" parse failed: {}'.format(self.node.name, self.cmd, repr(exc)))
+            metrics = {}
+        self.series.append(due, metrics, latency=latency, raw=(raw if (self.keep_raw or not self.parser) else None))
+        if self.exporter and metrics :
+            offset = due - self.anchor
+            self.exporter.add(self.node.name, self.name, 'dev', None, offset, offset + self.period, metrics, t=due)
+
+    async def stop(self) :
+        if self._process is None :
+            return
+        if self._process.returncode is None :
+            # end of input ends the remote loop after the sample in progress
+            self._process.stdin.close()
+            try :
+                await asyncio.wait_for(self._process.wait(), timeout=max(5.0, 2 * self.period))
+            except asyncio.TimeoutError :
+                self._process.kill()
+                await self._process.wait()
+        # let the reader take the last sample before stopping the ticker
+        await asyncio.wait(self._tasks[:1], timeout=5)
+        for task in self._tasks :
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logging.info('{} sampler "{}" {} samples, {} missed'.format(self.node.name, self.cmd, len(self.series), self.missed))
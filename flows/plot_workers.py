@@ -0,0 +1,331 @@
+# ---------------------------------------------------------------
+# * Copyright (c) 2018
+# * Broadcom Corporation
+# * All Rights Reserved.
+# *---------------------------------------------------------------
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.  Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the documentation and/or other
+# materials provided with the distribution.  Neither the name of the Broadcom nor the names of
+# contributors may be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Long lived plotting workers, i.e. a pool of gnuplot processes fed scripts over stdin
+#
+# Date October 2026
+
+import logging
+import asyncio
+import subprocess
+import os
+import itertools
+import hashlib
+import threading
+import concurrent.futures
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Each worker owns one gnuplot process that stays up across plots. A job is written to its stdin as
+#
+#   reset; <script>; unset output; print "<marker>"
+#
+# where unset output closes (flushes) the image file and print, which writes to stderr, tells the
+# worker the job is done. Anything gnuplot wrote to stderr before the marker is the job's error
+# output. Should gnuplot exit, e.g. on a fatal script error, the job gets what stderr had and the
+# worker starts a new gnuplot for the next job. The job queue is bounded so callers scheduling many
+# plots at once wait for room (back pressure) rather than piling everything up.
+class gnuplot_pool(object):
+    gnuplot = '/usr/bin/gnuplot'
+    JOB_TIMEOUT = 300
+    _pools = {}
+
+    @classmethod
+    def get(cls, size=None, gnuplot=None) :
+        # one pool per event loop since the queue and the processes belong to a loop
+        loop = asyncio.get_running_loop()
+        if loop not in cls._pools :
+            cls._pools[loop] = gnuplot_pool(size=size, gnuplot=gnuplot)
+        return cls._pools[loop]
+
+    @classmethod
+    async def close_all(cls) :
+        loop = asyncio.get_running_loop()
+        pool = cls._pools.pop(loop, None)
+        if pool :
+            await pool.close()
+
+    def __init__(self, size=None, queue_depth=None, gnuplot=None) :
+        self.size = size or os.cpu_count() or 1
+        self.gnuplot = gnuplot or gnuplot_pool.gnuplot
+        self.queue = asyncio.Queue(maxsize=(queue_depth or 2 * self.size))
+        self.workers = []
+        self.jobids = itertools.count(1)
+
+    def _start(self) :
+        if not self.workers :
+            self.workers = [asyncio.ensure_future(self._worker(ix)) for ix in range(self.size)]
+
+    async def _spawn(self) :
+        process = await asyncio.create_subprocess_exec(self.gnuplot, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        logging.debug('gnuplot worker started pid={}'.format(process.pid))
+        return process
+
+    async def _job(self, process, script) :
+        marker = '__gnuplot_pool_done_{}__'.format(next(self.jobids))
+        process.stdin.write('reset\n{}\nunset output\nprint "{}"\n'.format(script, marker).encode())
+        await process.stdin.drain()
+        lines = []
+        while True :
+            line = await asyncio.wait_for(process.stderr.readline(), timeout=gnuplot_pool.JOB_TIMEOUT)
+            if not line :
+                lines.append('gnuplot exited with {}'.format(await process.wait()))
+                return lines
+            line = line.decode('utf-8', errors='replace').rstrip()
+            if line == marker :
+                return lines
+            lines.append(line)
+
+    async def _worker(self, wid) :
+        process = None
+        while True :
+            job = await self.queue.get()
+            try :
+                if job is None :
+                    break
+                script, future = job
+                if process is None or process.returncode is not None :
+                    try :
+                        process = await self._spawn()
+                    except OSError as exc :
+                        # e.g. no gnuplot installed, fail the job rather than the worker
+                        process = None
+                        if not future.done() :
+                            future.set_result(['gnuplot {} failed to start: {}'.format(self.gnuplot, repr(exc))])
+                        continue
+                try :
+                    errors = await self._job(process, script)
+                except (asyncio.TimeoutError, BrokenPipeError, ConnectionResetError) as exc :
+                    errors = ['gnuplot worker {} failed: {}'.format(wid, repr(exc))]
+                    process.kill()
+                    await process.wait()
+                if process.returncode is not None :
+                    process = None
+                if not future.done() :
+                    future.set_result(errors)
+            finally :
+                self.queue.task_done()
+        if process is not None and process.returncode is None :
+            process.stdin.close()
+            await process.wait()
+
+    async def run(self, script, name=None) :
+        # returns the gnuplot error lines of the job, an empty list on success
+        self._start()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((script, future))
+        errors = await future
+        if errors :
+            logging.error('gnuplot {}: {}'.format(name, ' '.join(errors)))
+        else :
+            logging.debug('gnuplot {} done'.format(name))
+        return errors
+
+    async def close(self) :
+        for worker in self.workers :
+            await self.queue.put(None)
+        if self.workers :
+            await asyncio.wait(self.workers)
+        self.workers = []
+
+
+# Matplotlib rendering off the event loop. Jobs are module level render functions run in a process pool,
+# at most max_pending are in flight and submit() blocks beyond that so a producer streaming thousands of
+# plots runs in constant memory. Each worker process uses the Agg backend and recycles one figure, it's
+# cleared and resized per job instead of pyplot accumulating a new figure for every plot.
+_worker_figure = None
+
+def _render_init() :
+    import matplotlib
+    matplotlib.use('Agg')
+
+def _figure(figsize) :
+    global _worker_figure
+    import matplotlib.pyplot as plt
+    if _worker_figure is None :
+        _worker_figure = plt.figure(figsize=figsize)
+    else :
+        _worker_figure.clf()
+        _worker_figure.set_size_inches(figsize)
+    return _worker_figure
+
+def render_dendrogram(linkage_matrix, filename, title=None, figsize=(18,10)) :
+    from scipy.cluster import hierarchy
+    figure = _figure(figsize)
+    axes = figure.add_subplot(111)
+    hierarchy.dendrogram(linkage_matrix, ax=axes)
+    axes.set_title(title)
+    figure.savefig(filename)
+    return filename
+
+def render_histograms(datasets, filename, title=None, labels=None, colors=None, bins='auto', figsize=(10,5)) :
+    # one histogram per dataset, overlaid with a legend when labels are given
+    figure = _figure(figsize)
+    axes = figure.add_subplot(111)
+    if len(datasets) == 1 :
+        axes.hist(datasets[0], bins=bins, color=(colors[0] if colors else None))
+    else :
+        axes.hist(datasets, bins=bins, label=labels, color=colors)
+    if labels :
+        axes.legend(loc='upper right')
+    axes.set_title(title)
+    figure.savefig(filename)
+    return filename
+
+def render_ks_heatmap(dvalues, pvalues, filename, title=None, figsize=(18,8)) :
+    # D and log10(p) side by side from the condensed KS table, one image however many runs
+    from scipy.spatial import distance
+    d = distance.squareform(dvalues)
+    p = distance.squareform(pvalues)
+    np.fill_diagonal(p, 1.0)
+    figure = _figure(figsize)
+    daxes, paxes = figure.subplots(1, 2)
+    image = daxes.imshow(d, cmap='viridis', interpolation='nearest')
+    figure.colorbar(image, ax=daxes, label='KS D')
+    daxes.set_title('{} KS D'.format(title))
+    image = paxes.imshow(np.log10(np.maximum(p, 1e-300)), cmap='magma', interpolation='nearest')
+    figure.colorbar(image, ax=paxes, label='log10(p)')
+    paxes.set_title('{} KS p'.format(title))
+    figure.savefig(filename)
+    return filename
+
+def render_cdf_overlay(curves, labels, filename, title=None, figsize=(18,10)) :
+    # curves are (x, cdf) per run, coloured by the run's cluster label
+    import matplotlib
+    figure = _figure(figsize)
+    axes = figure.add_subplot(111)
+    colormap = matplotlib.colormaps['tab10']
+    for (x, y), label in zip(curves, labels) :
+        axes.step(x, y, where='post', color=colormap((int(label) - 1) % 10), linewidth=0.8, alpha=0.6)
+    handles = [matplotlib.lines.Line2D([], [], color=colormap((int(label) - 1) % 10), label='cluster {}'.format(label)) for label in sorted(set(labels))]
+    axes.legend(handles=handles, loc='lower right')
+    axes.set_xlabel('time (ms)')
+    axes.set_ylabel('cdf')
+    axes.set_ylim(0, 1.01)
+    axes.grid(True)
+    axes.set_title(title)
+    figure.savefig(filename)
+    return filename
+
+class render_pipeline(object):
+
+    def __init__(self, workers=None, max_pending=None) :
+        self.workers = workers or os.cpu_count() or 1
+        self.pending = threading.BoundedSemaphore(max_pending or 2 * self.workers)
+        self.executor = None
+        self.futures = set()
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs) :
+        if self.executor is None :
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=_render_init)
+        self.pending.acquire()
+        try :
+            future = self.executor.submit(func, *args, **kwargs)
+        except :
+            self.pending.release()
+            raise
+        with self.lock :
+            self.futures.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future) :
+        self.pending.release()
+        with self.lock :
+            self.futures.discard(future)
+        if not future.cancelled() and not future.exception() :
+            logging.debug('rendered {}'.format(future.result()))
+
+    def wait(self, futures=None) :
+        # waits for the futures submit() returned, all the pending ones by default, failures are
+        # logged here and returned, so a caller that submits waits on its futures
+        if futures is None :
+            with self.lock :
+                futures = list(self.futures)
+        concurrent.futures.wait(futures)
+        failed = [future for future in futures if not future.cancelled() and future.exception()]
+        for future in failed :
+            logging.error('render job failed: {}'.format(repr(future.exception())))
+        return failed
+
+    def close(self) :
+        self.wait()
+        if self.executor is not None :
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+
+# Sidecar manifest of what was last generated in a directory so post processing reruns only redo
+# outputs whose inputs changed. A line '<key> <file>' is appended per generated file, the last line
+# for a file wins. An output is current when it exists and was recorded with the same key, where the
+# key is a hash over everything that went into it, e.g. histogram content plus the gnuplot script.
+class plot_manifest(object):
+    FILENAME = '.plot_manifest'
+    _manifests = {}
+
+    @classmethod
+    def get(cls, directory) :
+        directory = os.path.abspath(directory)
+        if directory not in cls._manifests :
+            cls._manifests[directory] = plot_manifest(directory)
+        return cls._manifests[directory]
+
+    @staticmethod
+    def key(*parts) :
+        sha = hashlib.sha1()
+        for part in parts :
+            sha.update(part if isinstance(part, bytes) else str(part).encode())
+            sha.update(b'\0')
+        return sha.hexdigest()
+
+    @classmethod
+    def current(cls, filenames, key) :
+        return all(cls.get(os.path.dirname(filename) or '.').lookup(os.path.basename(filename)) == key and os.path.exists(filename) for filename in filenames)
+
+    @classmethod
+    def record(cls, filenames, key) :
+        for filename in filenames :
+            cls.get(os.path.dirname(filename) or '.').store(os.path.basename(filename), key)
+
+    def __init__(self, directory) :
+        self.filename = os.path.join(directory, plot_manifest.FILENAME)
+        self.keys = {}
+        try :
+            with open(self.filename) as fid :
+                for line in fid :
+                    fields = line.rstrip('\n').split(' ', 1)
+                    if len(fields) == 2 :
+                        self.keys[fields[1]] = fields[0]
+        except FileNotFoundError :
+            pass
+
+    def lookup(self, name) :
+        return self.keys.get(name)
+
+    def store(self, name, key) :
+        self.keys[name] = key
+        with open(self.filename, 'a') as fid :
+            fid.write('{} {}\n'.format(key, name))
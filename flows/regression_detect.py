@@ -0,0 +1,138 @@
+# ---------------------------------------------------------------
+# * Copyright (c) 2018
+# * Broadcom Corporation
+# * All Rights Reserved.
+# *---------------------------------------------------------------
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.  Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the documentation and/or other
+# materials provided with the distribution.  Neither the name of the Broadcom nor the names of
+# contributors may be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Change point and regression detection over per run summary series, e.g. nightly campaigns
+#
+# Date October 2026
+
+import logging
+import math
+import collections
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Each metric is a series with one value per run in history order, e.g. the values from
+# iperf_flow.run_summary(). A run t is compared as part of a recent window of min_size runs
+# against the baseline of the window runs before them with Welch's t test. Window sums come
+# from cumulative sums so a whole history is scanned at once, and update() only checks the
+# newest run. Effect size is Cohen's d plus the absolute and relative change of the means.
+shift = collections.namedtuple('shift', ['metric', 'run', 'detected_at', 'pvalue', 'effect_size', 'delta', 'relative', 'baseline_mean', 'recent_mean'])
+
+def _window_stats(x, size) :
+    # mean and variance (ddof=1) of the size long window ending at each index, NaN before that
+    c1 = np.concatenate(([0.0], np.cumsum(x)))
+    c2 = np.concatenate(([0.0], np.cumsum(x * x)))
+    mean = np.full(len(x), np.nan)
+    var = np.full(len(x), np.nan)
+    if len(x) >= size :
+        s1 = c1[size:] - c1[:-size]
+        s2 = c2[size:] - c2[:-size]
+        mean[size - 1:] = s1 / size
+        var[size - 1:] = np.maximum(s2 - s1 * s1 / size, 0) / max(size - 1, 1)
+    return mean, var
+
+def welch(mean1, var1, n1, mean2, var2, n2) :
+    from scipy import stats
+    se2 = var1 / n1 + var2 / n2
+    with np.errstate(divide='ignore', invalid='ignore') :
+        t = (mean2 - mean1) / np.sqrt(se2)
+        dof = se2 * se2 / ((var1 / n1) ** 2 / max(n1 - 1, 1) + (var2 / n2) ** 2 / max(n2 - 1, 1))
+        p = 2 * stats.t.sf(np.abs(t), dof)
+        pooled = np.sqrt(((n1 - 1) * var1 + (n2 - 1) * var2) / (n1 + n2 - 2))
+        d = (mean2 - mean1) / pooled
+    # a shift between two constant segments is as significant as it gets
+    constant = (se2 == 0) & (mean1 != mean2)
+    p = np.where(constant, 0.0, p)
+    return t, p, d
+
+def scan(x, window=20, min_size=5) :
+    # p-value and effect size per run of the recent window ending there against its baseline
+    x = np.asarray(x, dtype=np.float64)
+    bmean, bvar = _window_stats(x, window)
+    rmean, rvar = _window_stats(x, min_size)
+    # the baseline window ends right before the recent window starts
+    base_mean = np.full(len(x), np.nan)
+    base_var = np.full(len(x), np.nan)
+    base_mean[min_size:] = bmean[:-min_size]
+    base_var[min_size:] = bvar[:-min_size]
+    t, p, d = welch(base_mean, base_var, window, rmean, rvar, min_size)
+    return p, d, base_mean, rmean
+
+def first_shift(x, metric=None, window=20, min_size=5, alpha=0.001) :
+    p, d, base_mean, recent_mean = scan(x, window=window, min_size=min_size)
+    hits = np.flatnonzero(np.nan_to_num(p, nan=1.0) < alpha)
+    if not len(hits) :
+        return None
+    t = int(hits[0])
+    delta = float(recent_mean[t] - base_mean[t])
+    relative = float(delta / base_mean[t]) if base_mean[t] else math.inf
+    return shift(metric, t - min_size + 1, t, float(p[t]), float(d[t]), delta, relative, float(base_mean[t]), float(recent_mean[t]))
+
+class regression_detector(object):
+
+    def __init__(self, window=20, min_size=5, alpha=0.001) :
+        self.window = window
+        self.min_size = min_size
+        self.alpha = alpha
+        self.series = collections.defaultdict(list)
+        self.alerts = {}
+
+    def update(self, summary) :
+        # append one run's summary, a dict of metric -> value, and check only the newest run
+        new = []
+        for metric, value in summary.items() :
+            x = self.series[metric]
+            x.append(np.nan if value is None else float(value))
+            if metric in self.alerts or len(x) < self.window + self.min_size :
+                continue
+            tail = np.array(x[-(self.window + self.min_size):])
+            if np.isnan(tail).any() :
+                continue
+            found = first_shift(tail, metric=metric, window=self.window, min_size=self.min_size, alpha=self.alpha)
+            if found and found.detected_at == len(tail) - 1 :
+                offset = len(x) - len(tail)
+                found = found._replace(run=found.run + offset, detected_at=found.detected_at + offset)
+                self.alerts[metric] = found
+                new.append(found)
+                logging.warning('Regression {} at run {} p={:.3g} effect size={:.2f} ({:+.1%})'.format(metric, found.run, found.pvalue, found.effect_size, found.relative))
+        return new
+
+    def scan(self) :
+        # the first shift per metric over the whole history
+        results = {}
+        for metric, x in self.series.items() :
+            results[metric] = first_shift(np.array(x), metric=metric, window=self.window, min_size=self.min_size, alpha=self.alpha)
+        return results
+
+def distance_series(histograms, window=20) :
+    # per run Wasserstein distance (us) to the merged histogram of the window runs before it, so
+    # shape changes that leave the summary values alone still show up as a series to scan
+    import histogram_stats
+    from flows import flow_histogram
+    distances = np.full(len(histograms), np.nan)
+    for ix in range(1, len(histograms)) :
+        baseline = flow_histogram.merge(histograms[max(0, ix - window):ix])
+        distances[ix] = histogram_stats.wasserstein(baseline, histograms[ix])
+    return distances
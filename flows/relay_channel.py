@@ -0,0 +1,262 @@
+# ---------------------------------------------------------------
+# * Copyright (c) 2018
+# * Broadcom Corporation
+# * All Rights Reserved.
+# *---------------------------------------------------------------
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.  Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the documentation and/or other
+# materials provided with the distribution.  Neither the name of the Broadcom nor the names of
+# contributors may be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# Persistent multiplexed channel to a relay host, commands for the relayed (ush) devices share it
+#
+# Date October 2026
+
+import logging
+import asyncio
+import subprocess
+import base64
+import time
+import uuid
+
+import deadline_scheduler
+
+logger = logging.getLogger(__name__)
+
+# One long lived ssh per relay host runs a dispatcher loop reading a request per stdin line,
+#
+#   <id> <device> <base64 of the command>
+#
+# and running ush to the device in the background, so requests to many devices run at once over
+# the one channel. Each output line comes back on the stream it was written to tagged <id>:1: or
+# <id>:2:, the stdout stream carries the exit code in a marker line and both streams end the
+# request with a done marker. Lines go to the request's ssh_session the way SSHReaderProtocol
+# would put them there, results, logging and returncode included, so a relayed command costs a
+# line on the channel and a ush spawn on the relay instead of an ssh handshake. Request timeouts
+# use the shared deadline_scheduler, a timed out request is abandoned, its returncode stays None,
+# late output for it is dropped and a kill line, <id> -, has the dispatcher kill that request's
+# process tree on the relay. A request's job holds a file in the dispatcher's temp directory until
+# it's done, the dispatcher forgets the pids whose file is gone and only kills a pid whose file is
+# still there, i.e. a job that hasn't exited, so a late kill can't hit a reused pid. Each started
+# dispatcher is a relay_dispatcher with its own requests and readers, so one dying only fails the
+# requests sent to it with 255 while the next request starts a new one. Channels are per user and
+# relay. The relay needs base64, mktemp, pgrep and a sed with -u.
+
+DISPATCHER = r'''M={marker}
+D=$(mktemp -d); trap 'rm -rf "$D"' EXIT
+killtree() {{ for c in $(pgrep -P "$1"); do killtree "$c"; done; kill -TERM "$1" 2>/dev/null; }}
+ids=
+while read -r id host b64; do
+  keep=
+  for i in $ids; do
+    if [ -e "$D/$i" ]; then keep="$keep $i"; else unset "p_$i"; fi
+  done
+  ids=$keep
+  if [ "$host" = "-" ]; then
+    eval "p=\$p_$id"; [ -n "$p" ] && [ -e "$D/$id" ] && killtree "$p"; rm -f "$D/$id"; unset "p_$id"; continue
+  fi
+  : >"$D/$id"
+  ( cmd=$(printf '%s' "$b64" | base64 -d)
+    {{ {{ {ush} "$host" "$cmd" </dev/null; echo "$M:x:$?"; }} 2>&1 1>&3 3>&- | sed -u "s/^/$id:2:/" 1>&2; }} 3>&1 | sed -u "s/^/$id:1:/"
+    rm -f "$D/$id"; echo "$id:d:$M"; echo "$id:d:$M" >&2 ) </dev/null &
+  eval "p_$id=$!"; ids="$ids $id"
+done
+wait
+'''
+
+class relay_request(object) :
+    def __init__(self, session, cmd) :
+        self.session = session
+        self.cmd = cmd
+        self.done = asyncio.Event()
+        self.streams = 2
+        self.iowatchdog = None
+        self.watchdog = None
+
+class relay_dispatcher(object) :
+    # one dispatcher process on the relay and the requests sent to it
+    def __init__(self, channel, process) :
+        self.channel = channel
+        self.process = process
+        self.requests = {}
+        self.readers = [asyncio.ensure_future(self._demux(process.stdout, 1)), asyncio.ensure_future(self._demux(process.stderr, 2))]
+        asyncio.ensure_future(self._exited())
+
+    @property
+    def alive(self) :
+        return self.process.returncode is None
+
+    async def _exited(self) :
+        returncode = await self.process.wait()
+        await asyncio.wait(self.readers, timeout=5)
+        channel = self.channel
+        if channel.dispatcher is self :
+            channel.dispatcher = None
+        if self.requests :
+            logging.error('relay channel to {} exited ({}) with {} commands pending'.format(channel.relay, returncode, len(self.requests)))
+        for rid in list(self.requests) :
+            request = self.requests.pop(rid)
+            request.session.returncode = 255
+            channel._finish(request)
+        if returncode == 255 :
+            from ssh_nodes import ssh_master_pool
+            ssh_master_pool.invalidate(channel.user, channel.relay)
+
+    async def _demux(self, stream, fd) :
+        marker = self.channel.marker
+        while True :
+            line = await stream.readline()
+            if not line :
+                break
+            text = line.decode('utf-8', errors='replace').rstrip('\n')
+            if text.endswith(':d:{}'.format(marker)) :
+                rid = text.split(':', 1)[0]
+                request = self.requests.get(rid)
+                if request :
+                    request.streams -= 1
+                    if not request.streams :
+                        del self.requests[rid]
+                        self.channel._finish(request)
+                continue
+            rid, _, payload = text.partition(':{}:'.format(fd))
+            request = self.requests.get(rid)
+            if request is None :
+                # e.g. late output of a timed out command
+                logging.debug('relay {} unclaimed: {}'.format(self.channel.relay, text))
+                continue
+            session = request.session
+            if request.iowatchdog :
+                request.iowatchdog.touch()
+            pos = payload.find(marker)
+            if pos >= 0 :
+                # output without a trailing newline runs into the exit code marker
+                if pos :
+                    session.results.extend(payload[:pos].encode())
+                    if session.stdout is not None :
+                        session.stdout.extend(payload[:pos].encode())
+                session.returncode = int(payload[pos + len(marker) + 3:])
+                session.elapsed = time.monotonic() - session.started
+                continue
+            data = (payload + '\n').encode()
+            session.results.extend(data)
+            if fd == 1 :
+                if session.stdout is not None :
+                    session.stdout.extend(data)
+                if not session.silent_mode :
+                    session.adapter.info('{}'.format(payload.replace('\r', '')))
+            else :
+                if session.stderr is not None :
+                    session.stderr.extend(data)
+                session.adapter.warning('{} {}'.format(session.name, payload.replace('\r', '')))
+
+    def send(self, line) :
+        self.process.stdin.write(line.encode())
+
+class relay_channel(object) :
+    ush = '/usr/local/bin/ush'
+    enabled = True
+    _channels = {}
+
+    def __init__(self, relay, user='root') :
+        self.relay = relay
+        self.user = user
+        self.marker = '__relay_{}__'.format(uuid.uuid4().hex[:12])
+        self.dispatcher = None
+        self._ids = 0
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def get(cls, relay, user='root') :
+        channel = cls._channels.get((user, relay))
+        if channel is None :
+            channel = relay_channel(relay, user=user)
+            cls._channels[(user, relay)] = channel
+        return channel
+
+    async def _start(self) :
+        from ssh_nodes import ssh_master_pool
+        script = DISPATCHER.format(marker=self.marker, ush=relay_channel.ush)
+        sshcmd = await ssh_master_pool.command(self.user, self.relay, script)
+        process = await asyncio.create_subprocess_exec(*sshcmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.dispatcher = relay_dispatcher(self, process)
+        logging.info('relay channel to {} started pid={}'.format(self.relay, process.pid))
+
+    def _finish(self, request) :
+        for watchdog in (request.iowatchdog, request.watchdog) :
+            if watchdog :
+                watchdog.cancel()
+        request.done.set()
+
+    def _timeout(self, dispatcher, rid, kind) :
+        request = dispatcher.requests.pop(rid, None)
+        if request is None :
+            return
+        session = request.session
+        if kind == 'io' :
+            logging.error("{} IO timeout: cmd='{}' host(relay)={}({})".format(session.name, request.cmd, session.hostname, self.relay))
+        else :
+            logging.error("{}: timeout: cmd='{}' host(relay)={}({})".format(session.name, request.cmd, session.hostname, self.relay))
+        if dispatcher.alive :
+            try :
+                dispatcher.send('{} -\n'.format(rid))
+            except (ConnectionError, RuntimeError) as err :
+                logging.debug('relay {} kill of {} not sent: {}'.format(self.relay, rid, err))
+        self._finish(request)
+
+    async def run(self, session, cmd, IO_TIMEOUT=None, CMD_TIMEOUT=None) :
+        # runs cmd on session.hostname through the relay, filling in the session like post_cmd() does
+        async with self._lock :
+            if self.dispatcher is None or not self.dispatcher.alive :
+                await self._start()
+            dispatcher = self.dispatcher
+            self._ids += 1
+            rid = 'r{}'.format(self._ids)
+            request = relay_request(session, cmd)
+            deadlines = deadline_scheduler.shared(asyncio.get_running_loop())
+            if IO_TIMEOUT is not None :
+                request.iowatchdog = deadlines.watch(lambda : self._timeout(dispatcher, rid, 'io'), IO_TIMEOUT)
+            if CMD_TIMEOUT is not None :
+                request.watchdog = deadlines.watch(lambda : self._timeout(dispatcher, rid, 'cmd'), CMD_TIMEOUT)
+            dispatcher.requests[rid] = request
+            session.started = time.monotonic()
+            dispatcher.send('{} {} {}\n'.format(rid, session.hostname, base64.b64encode(cmd.encode()).decode()))
+            try :
+                await dispatcher.process.stdin.drain()
+            except ConnectionError as err :
+                logging.error('relay channel to {} write failed: {}'.format(self.relay, err))
+        await request.done.wait()
+        return session.results
+
+    async def close(self) :
+        dispatcher = self.dispatcher
+        self.dispatcher = None
+        if dispatcher is None or not dispatcher.alive :
+            return
+        # eof ends the dispatcher loop once its running commands finish
+        dispatcher.process.stdin.close()
+        try :
+            await asyncio.wait_for(dispatcher.process.wait(), timeout=10)
+        except asyncio.TimeoutError :
+            dispatcher.process.terminate()
+            await dispatcher.process.wait()
+
+    @classmethod
+    async def close_all(cls) :
+        channels = list(cls._channels.values())
+        cls._channels = {}
+        await asyncio.gather(*[channel.close() for channel in channels])
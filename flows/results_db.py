@@ -0,0 +1,183 @@
+# ---------------------------------------------------------------
+# * Copyright (c) 2018
+# * Broadcom Corporation
+# * All Rights Reserved.
+# *---------------------------------------------------------------
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.  Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the documentation and/or other
+# materials provided with the distribution.  Neither the name of the Broadcom nor the names of
+# contributors may be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Indexed local results database (sqlite) of runs, flows, interval rows and histogram summaries
+#
+# Date October 2026
+
+import logging
+import os
+import sqlite3
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# One sqlite file, no service, shared by all campaigns so history queries don't need to reparse
+# test.log or the csv files. A run groups the flows of one test invocation. Interval rows hold the
+# per interval reports by side (rx from the server, tx from the client), a metric the side doesn't
+# report is NULL. Times are epoch seconds. Queries return a dict of column name -> numpy array.
+class results_db(object):
+    schema = [
+        'CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, test TEXT, directory TEXT, created REAL)',
+        'CREATE TABLE IF NOT EXISTS flows (id INTEGER PRIMARY KEY, run_id INTEGER NOT NULL REFERENCES runs(id), name TEXT, flowid TEXT, server TEXT, client TEXT, dstip TEXT, proto TEXT, tos TEXT, starttime REAL, endtime REAL)',
+        'CREATE TABLE IF NOT EXISTS intervals (flow_id INTEGER NOT NULL REFERENCES flows(id), side TEXT, ix INTEGER, ts REAL, bytes REAL, throughput REAL, reads REAL, writes REAL, errwrites REAL, retry REAL, cwnd REAL, rtt REAL, jitter REAL, lostpkts REAL, totpkts REAL, meanlat REAL, minlat REAL, maxlat REAL, stdevlat REAL, pps REAL, inP REAL, inPvar REAL, pkts REAL, netPower REAL)',
+        'CREATE TABLE IF NOT EXISTS histograms (flow_id INTEGER NOT NULL REFERENCES flows(id), name TEXT, content_hash TEXT, binwidth INTEGER, population INTEGER, outliers INTEGER, lci_val INTEGER, uci_val INTEGER, p50 REAL, p90 REAL, p99 REAL, p999 REAL, entropy REAL, starttime REAL, endtime REAL)',
+        'CREATE INDEX IF NOT EXISTS runs_test ON runs (test)',
+        'CREATE INDEX IF NOT EXISTS flows_run ON flows (run_id)',
+        'CREATE INDEX IF NOT EXISTS flows_name ON flows (name, starttime)',
+        'CREATE INDEX IF NOT EXISTS flows_server ON flows (server)',
+        'CREATE INDEX IF NOT EXISTS flows_client ON flows (client)',
+        'CREATE INDEX IF NOT EXISTS flows_tos ON flows (tos)',
+        'CREATE INDEX IF NOT EXISTS flows_starttime ON flows (starttime)',
+        'CREATE INDEX IF NOT EXISTS intervals_flow ON intervals (flow_id, side, ix)',
+        'CREATE INDEX IF NOT EXISTS histograms_flow ON histograms (flow_id, name)',
+        'CREATE INDEX IF NOT EXISTS histograms_name ON histograms (name)',
+    ]
+    rx_columns = {'rxbytes' : 'bytes', 'rxthroughput' : 'throughput', 'reads' : 'reads', 'jitter' : 'jitter', 'rxlostpkts' : 'lostpkts', 'rxtotpkts' : 'totpkts', \
+                  'meanlat' : 'meanlat', 'minlat' : 'minlat', 'maxlat' : 'maxlat', 'stdevlat' : 'stdevlat', 'rxpps' : 'pps', 'inP' : 'inP', 'inPvar' : 'inPvar', \
+                  'rxpkts' : 'pkts', 'netPower' : 'netPower'}
+    tx_columns = {'txbytes' : 'bytes', 'txthroughput' : 'throughput', 'writes' : 'writes', 'errwrites' : 'errwrites', 'retry' : 'retry', 'cwnd' : 'cwnd', 'rtt' : 'rtt'}
+
+    def __init__(self, filename='results.db') :
+        self.filename = filename
+        self.path = os.path.abspath(filename)
+        self.db = sqlite3.connect(filename)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA foreign_keys=ON')
+        with self.db :
+            for statement in results_db.schema :
+                self.db.execute(statement)
+
+    def close(self) :
+        self.db.close()
+
+    @staticmethod
+    def _epoch(t) :
+        return t.timestamp() if t is not None else None
+
+    def new_run(self, test=None, directory=None) :
+        with self.db :
+            cursor = self.db.execute('INSERT INTO runs (test, directory, created) VALUES (?, ?, ?)', (test, directory, time.time()))
+        return cursor.lastrowid
+
+    def _interval_rows(self, flow_id, flowstats, side, columns, timestamps) :
+        series = {column : flowstats.get(key) or [] for key, column in columns.items()}
+        count = max([len(values) for values in series.values()] + [0])
+        if not count :
+            return [], []
+        names = list(series.keys())
+        rows = []
+        for ix in range(count) :
+            ts = self._epoch(timestamps[ix]) if ix < len(timestamps) else None
+            rows.append([flow_id, side, ix, ts] + [float(series[name][ix]) if ix < len(series[name]) else None for name in names])
+        return names, rows
+
+    def insert_flow(self, flow, run_id=None, test=None) :
+        # all the rows of a flow in one transaction. flowstats['histograms'] accumulates over runs
+        # unless stats_reset() is called, so a histogram goes in once per db file, the first time
+        # its flow is inserted, and not again with each later run
+        if run_id is None :
+            run_id = self.new_run(test=test)
+        flowstats = flow.flowstats
+        histograms = [h for h in flowstats.get('histograms') or [] if self.path not in getattr(h, 'stored', ())]
+        with self.db :
+            cursor = self.db.execute('INSERT INTO flows (run_id, name, flowid, server, client, dstip, proto, tos, starttime, endtime) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', \
+                                     (run_id, flow.name, flowstats.get('flowid'), str(flow.server), str(flow.client), flow.dstip, flow.proto, flow.tos, \
+                                      self._epoch(flowstats.get('starttime')), self._epoch(flowstats.get('endtime'))))
+            flow_id = cursor.lastrowid
+            for side, columns, timestamps in [('rx', results_db.rx_columns, flowstats.get('rxdatetime') or []), ('tx', results_db.tx_columns, flowstats.get('txdatetime') or [])] :
+                names, rows = self._interval_rows(flow_id, flowstats, side, columns, timestamps)
+                if rows :
+                    self.db.executemany('INSERT INTO intervals (flow_id, side, ix, ts, {}) VALUES ({})'.format(', '.join(names), ', '.join(['?'] * (4 + len(names)))), rows)
+            rows = []
+            for h in histograms :
+                p50, p90, p99, p999 = [float(v) for v in h.percentile([50, 90, 99, 99.9])]
+                rows.append((flow_id, h.name, h.content_hash, h.binwidth, h.population, int(h.outliers) if h.outliers is not None else None, \
+                             int(h.lci_val) if h.lci_val is not None else None, int(h.uci_val) if h.uci_val is not None else None, \
+                             p50, p90, p99, p999, h.entropy, self._epoch(h.starttime), self._epoch(h.endtime)))
+            if rows :
+                self.db.executemany('INSERT INTO histograms (flow_id, name, content_hash, binwidth, population, outliers, lci_val, uci_val, p50, p90, p99, p999, entropy, starttime, endtime) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        for h in histograms :
+            h.stored.add(self.path)
+        logging.debug('results db {} stored flow {} (id={})'.format(self.filename, flow.name, flow_id))
+        return flow_id
+
+    @staticmethod
+    def _where(test=None, flow=None, host=None, tos=None, since=None, until=None) :
+        clauses = []
+        args = []
+        if test is not None :
+            clauses.append('runs.test = ?')
+            args.append(test)
+        if flow is not None :
+            clauses.append('flows.name = ?')
+            args.append(flow)
+        if host is not None :
+            clauses.append('(flows.server = ? OR flows.client = ?)')
+            args.extend([host, host])
+        if tos is not None :
+            clauses.append('flows.tos = ?')
+            args.append(tos)
+        if since is not None :
+            clauses.append('flows.starttime >= ?')
+            args.append(since)
+        if until is not None :
+            clauses.append('flows.starttime < ?')
+            args.append(until)
+        return (' AND '.join(clauses) if clauses else '1'), args
+
+    def _arrays(self, sql, args, columns) :
+        rows = self.db.execute(sql, args).fetchall()
+        data = list(zip(*rows)) if rows else [() for column in columns]
+        arrays = {}
+        for column, values in zip(columns, data) :
+            try :
+                arrays[column] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            except (TypeError, ValueError) :
+                arrays[column] = np.array(values, dtype=object)
+        return arrays
+
+    def histograms(self, name=None, columns=('starttime', 'p50', 'p99', 'p999'), **kwargs) :
+        # e.g. histograms(name='T8', flow='UDP_LA1', since=time.time() - 90 * 86400, columns=('starttime', 'p99'))
+        where, args = results_db._where(**kwargs)
+        if name is not None :
+            where += ' AND histograms.name = ?'
+            args.append(name)
+        sql = 'SELECT {} FROM histograms JOIN flows ON histograms.flow_id = flows.id JOIN runs ON flows.run_id = runs.id WHERE {} ORDER BY flows.starttime'.format( \
+            ', '.join(['histograms.{}'.format(c) if c != 'flow' else 'flows.name' for c in columns]), where)
+        return self._arrays(sql, args, columns)
+
+    def intervals(self, side='rx', columns=('ts', 'throughput'), **kwargs) :
+        where, args = results_db._where(**kwargs)
+        where += ' AND intervals.side = ?'
+        args.append(side)
+        sql = 'SELECT {} FROM intervals JOIN flows ON intervals.flow_id = flows.id JOIN runs ON flows.run_id = runs.id WHERE {} ORDER BY flows.starttime, intervals.ix'.format( \
+            ', '.join(['intervals.{}'.format(c) if c != 'flow' else 'flows.name' for c in columns]), where)
+        return self._arrays(sql, args, columns)
+
+    def flows(self, columns=('id', 'name', 'starttime'), **kwargs) :
+        where, args = results_db._where(**kwargs)
+        sql = 'SELECT {} FROM flows JOIN runs ON flows.run_id = runs.id WHERE {} ORDER BY flows.starttime'.format(', '.join(['flows.{}'.format(c) for c in columns]), where)
+        return self._arrays(sql, args, columns)
@@ -34,6 +34,14 @@ import time, datetime
 import weakref
 import os
 import re
+import uuid
+import tempfile
+import periodic_sampler
+import wl_dumps
+import console_capture
+import deadline_scheduler
+import fleet
+import relay_channel
 
 from datetime import datetime as datetime, timezone
 
@@ -44,6 +52,10 @@ class ssh_node:
     DEFAULT_CMD_TIMEOUT = 30
     DEFAULT_CONNECT_TIMEOUT = 60.0
     rexec_tasks = []
+    samplers = []
+    # queued rexec commands per host run as one remote shell, see _run_batch()
+    coalesce = True
+    _batches = {}
     _loop = None
     instances = weakref.WeakSet()
     periodic_cmd_futures = []
@@ -90,7 +102,17 @@ class ssh_node:
             ssh_node.rexec_tasks = []
 
     @classmethod
-    def open_consoles(cls, silent_mode=False) :
+    def fleet_rexec(cls, cmd, nodes=None, concurrency=64, rate=5.0, burst=10, retries=2, IO_TIMEOUT=None, CMD_TIMEOUT=DEFAULT_CMD_TIMEOUT, masters=False) :
+        # cmd on every node, all instances by default, see fleet, returns a fleet_results table, e.g.
+        # ssh_node.fleet_rexec('wl -i {node.device} status').failed()
+        nodes = ssh_node.get_instances() if nodes is None else list(nodes)
+        return ssh_node.loop.run_until_complete(fleet.run(nodes, cmd, concurrency=concurrency, rate=rate, burst=burst, retries=retries, \
+                                                          IO_TIMEOUT=IO_TIMEOUT, CMD_TIMEOUT=CMD_TIMEOUT, masters=masters))
+
+    @classmethod
+    def open_consoles(cls, silent_mode=False, directory=None, ring_bytes=None) :
+        # console output is kept in a console_capture per node, node.console_log, bounded to ring_bytes
+        # in memory with older lines spilled to compressed files under directory when one is given
         nodes = ssh_node.get_instances()
         node_names = []
         tasks = []
@@ -111,6 +133,8 @@ class ssh_node:
             if node.ssh_speedups and not node.ssh_console_session and node.ipaddr not in ipaddrs:
                 logging.info('Run consoles speedup')
                 node.ssh_console_session = ssh_session(name=node.name, hostname=node.ipaddr, node=node, control_master=True, ssh_speedups=True, silent_mode=silent_mode)
+                node.console_log = console_capture.console_capture(name='{}_console'.format(node.name), directory=directory, ring_bytes=ring_bytes)
+                node.ssh_console_session.capture = node.console_log
                 node.console_task = asyncio.ensure_future(node.ssh_console_session.post_cmd(cmd='/usr/bin/dmesg -w', IO_TIMEOUT=None, CMD_TIMEOUT=None), loop=ssh_node.loop)
                 tasks.append(node.console_task)
                 ipaddrs.append(node.ipaddr)
@@ -146,6 +170,12 @@ class ssh_node:
             logging.info('Closing consoles: {}'.format(s.join(node_names)))
             ssh_node.loop.run_until_complete(asyncio.wait(tasks, timeout=60))
             logging.info('Closing consoles done: {}'.format(s.join(node_names)))
+        for node in nodes :
+            if node.console_log is not None :
+                node.console_log.close()
+        # consoles are closed at the end of a test, take the relay channels and pooled masters down too
+        ssh_node.loop.run_until_complete(relay_channel.relay_channel.close_all())
+        ssh_node.loop.run_until_complete(ssh_master_pool.close_all())
 
     @classmethod
     def periodic_cmds_stop(cls) :
@@ -157,6 +187,14 @@ class ssh_node:
             logging.debug("Awaiting kill periodic futures")
         logging.debug("Stop periodic futures done")
 
+    @classmethod
+    def samplers_stop(cls) :
+        async def stop_all() :
+            await asyncio.gather(*[sampler.stop() for sampler in ssh_node.samplers])
+        if ssh_node.samplers :
+            ssh_node.loop.run_until_complete(stop_all())
+        ssh_node.samplers = []
+
     def __init__(self, name=None, ipaddr=None, devip=None, console=False, device=None, ssh_speedups=False, silent_mode=False, sshtype='ssh', relay=None):
         self.ipaddr = ipaddr
         self.name = name
@@ -166,11 +204,12 @@ class ssh_node:
         self.sshtype = sshtype.lower()
         if self.sshtype.lower() == 'ssh' :
             self.ssh_speedups = ssh_speedups
-            self.controlmasters = '/tmp/controlmasters_{}'.format(self.ipaddr)
+            self.controlmasters = ssh_master_pool.controlpath('root', self.ipaddr)
         else :
             self.ssh_speedups = False
             self.controlmasters = None
         self.ssh_console_session = None
+        self.console_log = None
 
         self.relay = None
         if relay :
@@ -198,6 +237,7 @@ class ssh_node:
             results=self.rexec(cmd='/usr/bin/wl -i {} {}'.format(self.device, cmd))
         else :
             results=self.rexec(cmd='/usr/bin/wl {}'.format(cmd))
+        results.parser = wl_dumps.parser_for(cmd)
         return results
 
     def dhd (self, cmd) :
@@ -205,29 +245,193 @@ class ssh_node:
             results=self.rexec(cmd='/usr/bin/dhd -i {} {}'.format(self.device, cmd))
         else :
             results=self.rexec(cmd='/usr/bin/dhd {}'.format(cmd))
+        results.parser = wl_dumps.parser_for(cmd)
         return results
 
+    @classmethod
+    def wl_snapshot(cls, nodes, cmds=('counters', 'dump ampdu'), tool='wl', timeout=None) :
+        # runs the dumps on all the nodes at once, i.e. one remote shell per node, and returns
+        # {node name : {cmd : record}}, e.g. as the before or after of wl_dumps.device_deltas()
+        sessions = {node.name : {cmd : getattr(node, tool)(cmd) for cmd in cmds} for node in nodes}
+        ssh_node.run_all_commands(timeout=timeout)
+        return {name : {cmd : session.record for cmd, session in node_sessions.items()} for name, node_sessions in sessions.items()}
+
     def rexec(self, cmd='pwd', IO_TIMEOUT=DEFAULT_IO_TIMEOUT, CMD_TIMEOUT=DEFAULT_CMD_TIMEOUT, CONNECT_TIMEOUT=DEFAULT_CONNECT_TIMEOUT, run_now=False) :
         io_timer = IO_TIMEOUT
         cmd_timer = CMD_TIMEOUT
         connect_timer = CONNECT_TIMEOUT
         this_session = ssh_session(name=self.name, hostname=self.ipaddr, CONNECT_TIMEOUT=connect_timer, node=self, ssh_speedups=True)
-        this_future = asyncio.ensure_future(this_session.post_cmd(cmd=cmd, IO_TIMEOUT=io_timer, CMD_TIMEOUT=cmd_timer), loop=ssh_node.loop)
+        if run_now or not ssh_node.coalesce or (self.relay and relay_channel.relay_channel.enabled) :
+            this_future = asyncio.ensure_future(this_session.post_cmd(cmd=cmd, IO_TIMEOUT=io_timer, CMD_TIMEOUT=cmd_timer), loop=ssh_node.loop)
+        else :
+            # relayed commands are already cheap over the relay's channel, the rest are queued
+            # per host, the first command of a batch schedules it and it runs once the loop
+            # runs, e.g. run_all_commands(), by which time the rest of the commands are queued.
+            # Each command gets its own future, done with the session's results when that command
+            # is, like the post_cmd() task it would have had
+            key = (self.sshtype, self.relay, self.ipaddr)
+            if key not in ssh_node._batches :
+                ssh_node._batches[key] = []
+                asyncio.ensure_future(self._coalesced(key), loop=ssh_node.loop)
+            this_future = ssh_node.loop.create_future()
+            ssh_node._batches[key].append((this_session, cmd, io_timer, cmd_timer, this_future))
         if run_now:
             ssh_node.loop.run_until_complete(asyncio.wait([this_future], timeout=CMD_TIMEOUT))
-        else:
+        else :
             ssh_node.rexec_tasks.append(this_future)
             self.my_futures.append(this_future)
         return this_session
 
+    async def _coalesced(self, key) :
+        # commands queued while a batch runs go in the next one, so per host order is kept
+        queue = ssh_node._batches[key]
+        items = []
+        try :
+            while queue :
+                items = list(queue)
+                del queue[:]
+                requeue = []
+                if len(items) == 1 :
+                    session, cmd, io_timer, cmd_timer, done = items[0]
+                    await session.post_cmd(cmd=cmd, IO_TIMEOUT=io_timer, CMD_TIMEOUT=cmd_timer)
+                else :
+                    # commands a timed out batch never started go first in the next one
+                    requeue = await self._run_batch(items)
+                    queue[:0] = requeue
+                for item in items :
+                    if item not in requeue :
+                        item[4].set_result(item[0].results)
+        finally :
+            del ssh_node._batches[key]
+            # e.g. the batch was cancelled, nobody is left to run these so their waiters are released
+            for session, cmd, io_timer, cmd_timer, done in items + queue :
+                if not done.done() :
+                    done.set_result(session.results)
+
+    # A batch is one remote shell running the commands in order, each in a subshell and bracketed by
+    # marker lines on stdout and stderr, the stdout end marker carries the exit code. Output between
+    # markers goes to that command's session results, same as its own ssh would have produced, and
+    # elapsed is the time between its markers arriving. A command's CMD_TIMEOUT or IO_TIMEOUT
+    # expiring terminates the batch, that command keeps returncode None and the commands after it
+    # are handed back to _coalesced() to run in a fresh batch.
+    async def _run_batch(self, items) :
+        marker = '__ssh_batch_{}__'.format(uuid.uuid4().hex[:12])
+        script = '\n'.join(['echo {0}:b:{1}; echo {0}:b:{1} >&2; ( {2}\n); echo {0}:e:{1}:$?; echo {0}:e:{1} >&2'.format(marker, ix, cmd) for ix, (session, cmd, io_timer, cmd_timer, done) in enumerate(items)])
+        sessions = [item[0] for item in items]
+        for session, cmd, io_timer, cmd_timer, done in items :
+            session.cmd = cmd
+        logging.info('{} batch of {} commands: {}'.format(self.name, len(items), '; '.join([item[1] for item in items])))
+        sshcmd = await sessions[0].sshcmd(script)
+        start = time.monotonic()
+        state = {'current' : None, 'start' : start, 'io' : start, 'changed' : asyncio.Event(), 'begun' : set()}
+        childprocess = await asyncio.create_subprocess_exec(*sshcmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        async def demux(stream, fd) :
+            current = None
+            while True :
+                line = await stream.readline()
+                if not line :
+                    break
+                now = time.monotonic()
+                state['io'] = now
+                text = line.decode('utf-8', errors='replace').rstrip('\n')
+                pos = text.find(marker)
+                if pos >= 0 :
+                    # output without a trailing newline runs into the end marker
+                    if pos and current is not None :
+                        sessions[current].results.extend(text[:pos].encode())
+                    fields = text[pos + len(marker) + 1:].split(':')
+                    state['changed'].set()
+                    if fields[0] == 'b' :
+                        current = int(fields[1])
+                        if fd == 1 :
+                            state['current'] = current
+                            state['start'] = now
+                            state['begun'].add(current)
+                    else :
+                        if fd == 1 :
+                            sessions[current].returncode = int(fields[2])
+                            sessions[current].elapsed = now - state['start']
+                            state['current'] = None
+                        current = None
+                elif current is not None :
+                    session = sessions[current]
+                    session.results.extend(line)
+                    if fd == 2 :
+                        session.adapter.warning('{} {}'.format(session.name, text.replace('\r', '')))
+                    elif not session.silent_mode :
+                        session.adapter.info('{}'.format(text.replace('\r', '')))
+                else :
+                    logging.warning('{} {}'.format(self.name, text.replace('\r', '')))
+
+        def deadline() :
+            current = state['current']
+            if current is None :
+                return state['io'] + ssh_node.DEFAULT_CONNECT_TIMEOUT
+            session, cmd, io_timer, cmd_timer, done = items[current]
+            deadlines = [state['start'] + cmd_timer] if cmd_timer is not None else []
+            if io_timer is not None :
+                deadlines.append(state['io'] + io_timer)
+            return min(deadlines) if deadlines else None
+
+        readers = [asyncio.ensure_future(demux(childprocess.stdout, 1)), asyncio.ensure_future(demux(childprocess.stderr, 2))]
+        timedout = False
+        while True :
+            # wake up on a marker too, a command starting or ending changes the deadline
+            state['changed'].clear()
+            changed = asyncio.ensure_future(state['changed'].wait())
+            expires = deadline()
+            # only the readers still running, a finished one would make every wait return at once
+            done, pending = await asyncio.wait([reader for reader in readers if not reader.done()] + [changed], timeout=(max(0, expires - time.monotonic()) if expires is not None else None), return_when=asyncio.FIRST_COMPLETED)
+            changed.cancel()
+            if all(reader.done() for reader in readers) :
+                break
+            expires = deadline()
+            if expires is not None and time.monotonic() >= expires :
+                current = state['current']
+                logging.error("{} batch timeout: cmd='{}' host={}".format(self.name, items[current][1] if current is not None else None, self.ipaddr))
+                childprocess.terminate()
+                timedout = True
+                done, pending = await asyncio.wait(readers, timeout=5)
+                for reader in pending :
+                    reader.cancel()
+                break
+        returncode = await childprocess.wait()
+        if returncode == 255 and self.sshtype == 'ssh' :
+            ssh_master_pool.invalidate(sessions[0].user, self.ipaddr)
+        # a command timing out only costs that command, the ones queued behind it are run again in a
+        # fresh batch, unless the shell never got to start one, e.g. the host isn't reachable
+        requeue = [ix for ix in range(len(items)) if ix not in state['begun']] if timedout and state['begun'] else []
+        for ix, session in enumerate(sessions) :
+            if session.returncode is None and ix not in requeue :
+                logging.error("{} cmd='{}' did not complete".format(self.name, session.cmd))
+        if requeue :
+            logging.info('{} requeue {} commands after the batch timeout'.format(self.name, len(requeue)))
+        logging.debug('{} batch done in {:.3f} sec'.format(self.name, time.monotonic() - start))
+        return [items[ix] for ix in requeue]
+
+    def sample(self, cmd, period=1.0, parser='key_values', name=None, start_at=None, exporter=None, keep_raw=False) :
+        # streaming periodic sampler, see periodic_sampler, samples are taken while the loop runs,
+        # e.g. during iperf_flow.run(), and collected in the returned sampler's series
+        sampler = periodic_sampler.periodic_sampler(self, cmd, period=period, parser=parser, name=name, start_at=start_at, exporter=exporter, keep_raw=keep_raw)
+        ssh_node.loop.run_until_complete(sampler.start())
+        ssh_node.samplers.append(sampler)
+        return sampler
+
     async def clean(self) :
-        childprocess = await asyncio.create_subprocess_exec('/usr/bin/ssh', 'root@{}'.format(self.ipaddr), 'pkill', 'dmesg', stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        childprocess = await asyncio.create_subprocess_exec(*await ssh_master_pool.command('root', self.ipaddr, 'pkill', 'dmesg'), stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
         stdout, stderr = await childprocess.communicate()
         if stdout :
             logging.info('{}'.format(stdout))
         if stderr :
             logging.info('{}'.format(stderr))
 
+    def console_window(self, start=None, end=None) :
+        # console text between two times, e.g. a flow's run start and end, from the ring and the spill files
+        if self.console_log is not None :
+            return self.console_log.text(start, end)
+        return ''
+
     def close_console(self) :
         if self.ssh_console_session:
             self.ssh_console_session.close()
@@ -285,7 +489,7 @@ class ssh_node:
         if ush_flag :
             this_cmd.extend([*self.ssh, self.ipaddr, cmd])
         else:
-            this_cmd.extend([*self.ssh, 'root@{}'.format(self.ipaddr), cmd])
+            this_cmd.extend(await ssh_master_pool.command('root', self.ipaddr, cmd))
         logging.info("run cmd = {}".format(this_cmd))
 
         childprocess = await asyncio.create_subprocess_exec(*this_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
@@ -308,6 +512,100 @@ class ssh_node:
         log_file_handle.write(t + '\n')
         log_file_handle.flush()
 
+# One ssh control master per user@host shared by every command to that host, rexec sessions, consoles,
+# iperf launches and signals alike, so a command only costs a channel setup over the existing
+# connection rather than a full ssh handshake. Masters are started on first use and persist in the
+# background (ControlPersist). A master that was checked within CHECK_INTERVAL seconds is trusted,
+# otherwise it's health checked with -O check and restarted if that fails. A command failing with
+# ssh's own exit code 255 invalidates the host's master so the next command checks it again. When
+# no master can be started commands fall back to a plain ssh connection.
+class ssh_master_pool(object):
+    ssh = '/usr/bin/ssh'
+    enabled = True
+    CHECK_INTERVAL = 5.0
+    MASTER_TIMEOUT = 30.0
+    PERSIST = 600
+    _masters = {}
+    _started = set()
+    _locks = {}
+
+    @staticmethod
+    def controlpath(user, host) :
+        return '/tmp/controlmasters_{}@{}'.format(user, host)
+
+    @classmethod
+    async def _ssh(cls, *args, timeout=None) :
+        # stderr goes to a file, not a pipe, a master that backgrounds itself (-f) keeps its stderr
+        # open and would hold a pipe's transport and fds here for as long as it runs
+        with tempfile.TemporaryFile() as errfile :
+            childprocess = await asyncio.create_subprocess_exec(cls.ssh, *args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=errfile)
+            try :
+                returncode = await asyncio.wait_for(childprocess.wait(), timeout=timeout)
+            except asyncio.TimeoutError :
+                childprocess.kill()
+                await childprocess.wait()
+                return None, b'timeout'
+            if not returncode :
+                return returncode, b''
+            errfile.seek(0)
+            return returncode, errfile.read()
+
+    @classmethod
+    async def options(cls, user, host) :
+        # the ssh options to run a command over the user@host master, [] for a plain connection
+        if not cls.enabled :
+            return []
+        key = '{}@{}'.format(user, host)
+        if key not in cls._locks :
+            cls._locks[key] = asyncio.Lock()
+        async with cls._locks[key] :
+            path = ssh_master_pool.controlpath(user, host)
+            checked = cls._masters.get(key)
+            if checked is not None and (time.monotonic() - checked) < cls.CHECK_INTERVAL :
+                return ['-o', 'ControlPath={}'.format(path), '-o', 'ControlMaster=no']
+            returncode, _ = await cls._ssh('-o', 'ControlPath={}'.format(path), '-O', 'check', key, timeout=cls.MASTER_TIMEOUT)
+            if returncode != 0 :
+                if checked is not None :
+                    logging.warning('ssh master {} lost, restarting'.format(key))
+                try :
+                    os.remove(path)
+                except OSError :
+                    pass
+                start = time.monotonic()
+                returncode, stderr = await cls._ssh('-o', 'ControlMaster=yes', '-o', 'ControlPath={}'.format(path), '-o', 'ControlPersist={}'.format(cls.PERSIST), \
+                                                    '-o', 'ConnectTimeout={}'.format(int(cls.MASTER_TIMEOUT)), '-f', '-N', key, timeout=cls.MASTER_TIMEOUT)
+                if returncode != 0 :
+                    logging.error('ssh master {} failed ({}), using plain connections: {}'.format(key, returncode, stderr.decode('utf-8', errors='replace').strip()))
+                    cls._masters.pop(key, None)
+                    return []
+                logging.info('ssh master {} started in {:.3f} sec'.format(key, time.monotonic() - start))
+                cls._started.add(key)
+            cls._masters[key] = time.monotonic()
+            return ['-o', 'ControlPath={}'.format(path), '-o', 'ControlMaster=no']
+
+    @classmethod
+    async def command(cls, user, host, *args) :
+        # full argv to run args on user@host, e.g. await ssh_master_pool.command('root', ipaddr, 'pkill', 'dmesg')
+        return [cls.ssh, *await cls.options(user, host), '{}@{}'.format(user, host), *args]
+
+    @classmethod
+    def invalidate(cls, user, host) :
+        cls._masters.pop('{}@{}'.format(user, host), None)
+
+    @classmethod
+    async def close(cls, user, host) :
+        key = '{}@{}'.format(user, host)
+        cls._masters.pop(key, None)
+        cls._started.discard(key)
+        returncode, stderr = await cls._ssh('-o', 'ControlPath={}'.format(ssh_master_pool.controlpath(user, host)), '-O', 'exit', key, timeout=cls.MASTER_TIMEOUT)
+        logging.debug('ssh master {} exit ({})'.format(key, returncode))
+
+    @classmethod
+    async def close_all(cls) :
+        keys = list(cls._started)
+        if keys :
+            await asyncio.gather(*[cls.close(*key.split('@', 1)) for key in keys])
+
 # Multiplexed sessions need a control master to connect to. The run time parameters -M and -S also correspond
 # to ControlMaster and ControlPath, respectively. So first an initial master connection is established using
 # -M when accompanied by the path to the control socket using -S.
@@ -329,8 +627,10 @@ class ssh_session:
             self.debug = False
             self._session = session
             self._silent_mode = silent_mode
+            # watchdogs are entries in the loop's shared deadline_scheduler, data only touches the io one
+            self._deadlines = deadline_scheduler.shared(ssh_node.loop)
             if self._session.CONNECT_TIMEOUT is not None :
-                self.watchdog = ssh_node.loop.call_later(self._session.CONNECT_TIMEOUT, self.wd_timer)
+                self.watchdog = self._deadlines.watch(self.wd_timer, self._session.CONNECT_TIMEOUT)
             self._session.closed.clear()
             self.timeout_occurred = asyncio.Event()
             self.timeout_occurred.clear()
@@ -353,9 +653,9 @@ class ssh_session:
             self._session.adapter.debug('{} ssh node connection made pid=({})'.format(self._session.name, self._mypid))
             self._session.connected.set()
             if self._session.IO_TIMEOUT is not None :
-                self.iowatchdog = ssh_node.loop.call_later(self._session.IO_TIMEOUT, self.io_timer)
+                self.iowatchdog = self._deadlines.watch(self.io_timer, self._session.IO_TIMEOUT)
             if self._session.CMD_TIMEOUT is not None :
-                self.watchdog = ssh_node.loop.call_later(self._session.CMD_TIMEOUT, self.wd_timer)
+                self.watchdog = self._deadlines.watch(self.wd_timer, self._session.CMD_TIMEOUT)
 
         def connection_lost(self, exc):
             self._session.adapter.debug('{} node connection lost pid=({})'.format(self._session.name, self._mypid))
@@ -363,10 +663,18 @@ class ssh_session:
 
         def pipe_data_received(self, fd, data):
             if self._session.IO_TIMEOUT is not None :
-                self.iowatchdog.cancel()
+                self.iowatchdog.touch()
             if self.debug :
                 logging.debug('{} {}'.format(fd, data))
-            self._session.results.extend(data)
+            if self._session.capture is not None :
+                self._session.capture.write(data)
+            else :
+                self._session.results.extend(data)
+            # separate streams only when asked for, e.g. by a fleet run
+            if fd == 1 and self._session.stdout is not None :
+                self._session.stdout.extend(data)
+            elif fd == 2 and self._session.stderr is not None :
+                self._session.stderr.extend(data)
             data = data.decode("utf-8")
             if fd == 1:
                 self._stdoutbuffer += data
@@ -381,9 +689,6 @@ class ssh_session:
                     line, self._stderrbuffer = self._stderrbuffer.split("\n", 1)
                     self._session.adapter.warning('{} {}'.format(self._session.name, line.replace("\r","")))
 
-            if self._session.IO_TIMEOUT is not None :
-                self.iowatchdog = ssh_node.loop.call_later(self._session.IO_TIMEOUT, self.io_timer)
-
         def pipe_connection_lost(self, fd, exc):
             if self._session.IO_TIMEOUT is not None :
                 self.iowatchdog.cancel()
@@ -398,6 +703,12 @@ class ssh_session:
         def process_exited(self):
             if self._session.CMD_TIMEOUT is not None :
                 self.watchdog.cancel()
+            self._session.returncode = self._transport.get_returncode()
+            if self._session.started is not None :
+                self._session.elapsed = time.monotonic() - self._session.started
+            if self._session.returncode == 255 and self._session.node.sshtype == 'ssh' :
+                # ssh itself failed, have the pool check the master before the next command
+                ssh_master_pool.invalidate(self._session.user, self._session.hostname)
             logging.debug('{} subprocess with pid={} closed'.format(self._session.name, self._mypid))
             self._exited = True
             self._mypid = None
@@ -429,20 +740,21 @@ class ssh_session:
         self.opened.clear()
         self.connected.clear()
         self.results = bytearray()
+        self.returncode = None
+        self.elapsed = None
+        self.started = None
+        self.cmd = None
+        self.parser = None
+        self._record = None
+        self.capture = None
+        self.stdout = None
+        self.stderr = None
         self.sshpipe = None
         self.node = node
         self.CONNECT_TIMEOUT = CONNECT_TIMEOUT
         self.IO_TIMEOUT = None
         self.CMD_TIMEOUT = None
         self.control_master = control_master
-        ################################
-        # Why this is needed since we have it in the node?
-        # In the node, ssh=['/usr/bin/ssh'] but we are clearing it here. Why?
-        if node.relay :
-            self.ssh = ['/usr/bin/ssh', 'root@{}'.format(node.relay), '/usr/local/bin/ush', self.ipddr]
-        else :
-            self.ssh = []
-        ################################
 
         self.silent_mode = silent_mode
         self.ssh_speedups = ssh_speedups
@@ -459,6 +771,13 @@ class ssh_session:
         if self.node :
             return getattr(self.node, attr)
 
+    @property
+    def record(self) :
+        # the parsed results, e.g. of wl dump ampdu, None when the command has no parser
+        if self._record is None and self.parser :
+            self._record = self.parser(self.results.decode('utf-8', errors='replace'))
+        return self._record
+
     @property
     def is_established(self):
         return self._exited and self._closed_stdout and self._closed_stderr
@@ -466,7 +785,7 @@ class ssh_session:
     async def close(self) :
         if self.control_master :
             logging.info('control master close called {}'.format(self.controlmasters))
-            childprocess = await asyncio.create_subprocess_exec('/usr/bin/ssh', 'root@{}'.format(self.ipaddr), 'pkill', 'dmesg', stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            childprocess = await asyncio.create_subprocess_exec(*await ssh_master_pool.command('root', self.ipaddr, 'pkill', 'dmesg'), stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
             stdout, stderr = await childprocess.communicate()
             if stdout :
                 logging.info('{}'.format(stdout))
@@ -474,37 +793,39 @@ class ssh_session:
                 logging.info('{}'.format(stderr))
             self.sshpipe.terminate()
             await self.closed.wait()
-            logging.info('control master exit called {}'.format(self.controlmasters))
-            childprocess = await asyncio.create_subprocess_exec(self.ssh, '-o ControlPath={}'.format(self.controlmasters), '-O exit dummy-arg-why-needed', stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-            stdout, stderr = await childprocess.communicate()
-            if stdout :
-                logging.info('{}'.format(stdout))
-            if stderr :
-                logging.info('{}'.format(stderr))
+            # the master is the host's pooled one, shared with every other command to it, so it's
+            # left up here and taken down by ssh_master_pool.close_all() with the rest
+            logging.info('control master console closed {}'.format(self.controlmasters))
 
         elif self.sshpipe :
             self.sshpipe.terminate()
             await self.closed.wait()
 
+    async def sshcmd(self, cmd) :
+        # ssh commands, the console included, are channels over the host's pooled control master,
+        # a session without ssh_speedups, e.g. a fleet one off, makes its own connection
+        if self.node.relay :
+            # ush on the relay host reaches the node, the hop to the relay is ssh
+            user, host, args = 'root', self.node.relay, ['/usr/local/bin/ush', self.hostname, cmd]
+        elif self.node.sshtype == 'ssh' :
+            user, host, args = self.user, self.hostname, [cmd]
+        else :
+            return [*self.node.ssh, self.hostname, cmd]
+        if self.ssh_speedups :
+            return await ssh_master_pool.command(user, host, *args)
+        return [ssh_master_pool.ssh, '{}@{}'.format(user, host), *args]
+
     async def post_cmd(self, cmd=None, IO_TIMEOUT=None, CMD_TIMEOUT=None, ssh_speedups=True) :
         logging.debug("{} Post command {}".format(self.name, cmd))
         self.opened.clear()
         self.cmd = cmd
         self.IO_TIMEOUT = IO_TIMEOUT
         self.CMD_TIMEOUT = CMD_TIMEOUT
-        sshcmd = self.ssh
-        if self.control_master :
-            try:
-                os.remove(str(self.controlmasters))
-            except OSError:
-                pass
-            sshcmd.extend(['-o ControlMaster=yes', '-o ControlPath={}'.format(self.controlmasters), '-o ControlPersist=1'])
-        elif self.node.sshtype == 'ssh' :
-            sshcmd.append('-o ControlPath={}'.format(self.controlmasters))
-        if self.node.ssh_speedups :
-            sshcmd.extend(['{}@{}'.format(self.user, self.hostname), cmd])
-        else :
-            sshcmd.extend(['{}'.format(self.hostname), cmd])
+        self.started = time.monotonic()
+        if self.node.relay and relay_channel.relay_channel.enabled and not self.control_master :
+            logging.info('{} {} via relay {}'.format(self.name, cmd, self.node.relay))
+            return await relay_channel.relay_channel.get(self.node.relay).run(self, cmd, IO_TIMEOUT=IO_TIMEOUT, CMD_TIMEOUT=CMD_TIMEOUT)
+        sshcmd = await self.sshcmd(cmd)
         s = " "
         logging.info('{} {}'.format(self.name, s.join(sshcmd)))
         # self in the ReaderProtocol() is this ssh_session instance
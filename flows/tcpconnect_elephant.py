@@ -33,14 +33,14 @@ import argparse
 import time, datetime
 import os,sys
 import ssh_nodes
+import bootstrap_ci
 import numpy as np
-import tkinter
-import matplotlib.pyplot as plt
+import plot_workers
+import wl_dumps
 
 from flows import *
 from ssh_nodes import *
 from datetime import datetime as datetime, timezone
-from scipy import stats
 
 parser = argparse.ArgumentParser(description='Run mouse flow connect tests with elephant flows')
 parser.add_argument('-s','--server', type=str, default='10.19.87.7',required=False, help='host to run iperf server')
@@ -222,16 +222,15 @@ total_times = []
 for i in range(args.runcount) :
     print('run={} {}'.format(i, plottitle))
 
-    for dut in [dut_observe, ap] :
-        dut.wl(cmd='dump_clear ampdu')
-    ssh_node.run_all_commands()
+    before = ssh_node.wl_snapshot([dut_observe, ap], cmds=('dump_clear ampdu', 'counters'))
     mouse.stats_reset()
 
     iperf_flow.run(amount='256K', time=None, flows=[mouse], preclean=False, parallel=args.parallel, triptime=True)
 
-    for dut in [dut_observe, ap] :
-        dut.wl(cmd='dump ampdu')
-    ssh_node.run_all_commands()
+    after = ssh_node.wl_snapshot([dut_observe, ap], cmds=('dump ampdu', 'counters'))
+    device_run = wl_dumps.device_deltas(before, after)
+    mouse.attach_device_run(device_run)
+    logging.info('mpdu per ampdu={}'.format(dict(zip(device_run.duts, device_run.mpdu_per_ampdu))))
 
     if mouse.connect_time :
         connect_times.extend(mouse.connect_time)
@@ -253,38 +252,38 @@ ssh_node.close_consoles()
 loop.close()
 
 # Log results and produce final plots
+from scipy import stats
 if connect_times :
     logging.info('Connect times={}'.format(connect_times))
     mystats = 'Connect time stats={}'.format(stats.describe(connect_times))
     logging.info(mystats)
+    for statistic in ['mean', 'median', 99] :
+        logging.info('Connect time {} CI={}'.format(statistic, bootstrap_ci.bootstrap(connect_times, statistic=statistic)))
+    # plots render in worker processes which recycle their figure
+    renderer = iperf_flow.renderer()
     fqplot = os.path.join(args.output_directory, "connect_times.png")
-    plt.figure(figsize=(10,5))
-    plt.title("{}(ct)".format(plottitle))
-    plt.hist(connect_times, bins='auto', color='blue')
-    plt.savefig('{}'.format(fqplot))
+    renders = [renderer.submit(plot_workers.render_histograms, [connect_times], fqplot, title="{}(ct)".format(plottitle), colors=['blue'])]
 
     logging.info('Trip times={}'.format(trip_times))
     mystats = 'Trip time stats={}'.format(stats.describe(trip_times))
     logging.info(mystats)
+    for statistic in ['mean', 'median', 99] :
+        logging.info('Trip time {} CI={}'.format(statistic, bootstrap_ci.bootstrap(trip_times, statistic=statistic)))
     fqplot = os.path.join(args.output_directory, "trip_times.png")
-    plt.figure(figsize=(10,5))
-    plt.title("{}(trip)".format(plottitle))
-    plt.hist(trip_times, bins='auto', color='burlywood')
-    plt.savefig('{}'.format(fqplot))
+    renders.append(renderer.submit(plot_workers.render_histograms, [trip_times], fqplot, title="{}(trip)".format(plottitle), colors=['burlywood']))
 
     logging.info('Total times={}'.format(total_times))
     mystats = 'Total time stats={}'.format(stats.describe(total_times))
     logging.info(mystats)
+    for statistic in ['mean', 'median', 99] :
+        logging.info('Total time {} CI={}'.format(statistic, bootstrap_ci.bootstrap(total_times, statistic=statistic)))
     fqplot = os.path.join(args.output_directory, "total_times.png")
-    plt.figure(figsize=(10,5))
-    plt.title("{}(tot)".format(plottitle))
-    plt.hist(total_times, bins='auto', color='darkseagreen')
-    plt.savefig('{}'.format(fqplot))
+    renders.append(renderer.submit(plot_workers.render_histograms, [total_times], fqplot, title="{}(tot)".format(plottitle), colors=['darkseagreen']))
 
     fqplot = os.path.join(args.output_directory, "combined.png")
-    plt.hist([connect_times, trip_times, total_times], bins='auto', label=['ct', 'trip', 'tot'])
-    plt.title("{}(all)".format(plottitle))
-    plt.legend(loc='upper right')
-    plt.savefig('{}'.format(fqplot))
+    renders.append(renderer.submit(plot_workers.render_histograms, [connect_times, trip_times, total_times], fqplot, title="{}(all)".format(plottitle), labels=['ct', 'trip', 'tot']))
+    renderer.wait(renders)
 
+# through iperf_flow, which also drops its shared renderer so nothing later submits to a closed one
+iperf_flow.close_loop()
 logging.shutdown()
@@ -0,0 +1,181 @@
+# ---------------------------------------------------------------
+# * Copyright (c) 2018
+# * Broadcom Corporation
+# * All Rights Reserved.
+# *---------------------------------------------------------------
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.  Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the documentation and/or other
+# materials provided with the distribution.  Neither the name of the Broadcom nor the names of
+# contributors may be used to endorse or promote products derived from this software without
+# specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# Parsers for wl/dhd dumps, e.g. dump ampdu, counters, status and wme_ac, into typed records and arrays
+#
+# Date October 2026
+
+import logging
+import re
+import collections
+import numpy as np
+
+from periodic_sampler import key_values
+
+logger = logging.getLogger(__name__)
+
+# A record is a dict. Counters are ints, histograms are int64 count arrays indexed by bin, e.g.
+#
+#   TX MCS  :  0(0%)  12(1%)  340(45%) ...
+#   MPDUdens:   0  10   3 ...
+#
+# where the counts may carry a (percent) and continue on indented lines. dump ampdu's MPDU density
+# histograms count AMPDUs by length starting at 1 MPDU, the rate histograms start at MCS 0.
+_histogram_line = re.compile(r'^\s*(?P<label>[A-Za-z][A-Za-z0-9 _/\-]*?)\s*:\s*(?P<items>.*)$')
+_percent = re.compile(r'\(\s*[0-9.]+%\)')
+_range = re.compile(r'\(\s*\d+\s*-\s*\d+\s*\)')
+
+def _counts(text) :
+    tokens = _range.sub(' ', _percent.sub(' ', text)).split()
+    if tokens and all(token.isdigit() for token in tokens) :
+        return [int(token) for token in tokens]
+    return None
+
+def _integers(metrics) :
+    return {name : (int(value) if float(value).is_integer() else value) for name, value in metrics.items()}
+
+def histogram_first_bin(label) :
+    return 1 if 'dens' in label else 0
+
+def parse_ampdu(text) :
+    record = {'counters' : {}, 'histograms' : {}}
+    label = None
+    for line in text.splitlines() :
+        m = _histogram_line.match(line)
+        if m :
+            counts = _counts(m.group('items'))
+            if counts is not None and len(counts) > 1 :
+                label = m.group('label').strip().lower().replace(' ', '_')
+                record['histograms'][label] = counts
+                continue
+        elif label :
+            counts = _counts(line)
+            if counts is not None :
+                record['histograms'][label].extend(counts)
+                continue
+        label = None
+        record['counters'].update(_integers(key_values(line)))
+    record['histograms'] = {name : np.asarray(counts, dtype=np.int64) for name, counts in record['histograms'].items()}
+    return record
+
+def parse_counters(text) :
+    return _integers(key_values(text))
+
+_status = {'ssid' : (re.compile(r'SSID:\s*"(.*)"'), str), 'mode' : (re.compile(r'Mode:\s*(\S+)'), str), 'rssi' : (re.compile(r'RSSI:\s*(-?\d+)\s*dBm'), int), \
+           'snr' : (re.compile(r'SNR:\s*(-?\d+)\s*dB'), int), 'noise' : (re.compile(r'noise:\s*(-?\d+)\s*dBm'), int), 'channel' : (re.compile(r'\bChannel:\s*(\S+)'), str), \
+           'bssid' : (re.compile(r'BSSID:\s*([0-9A-Fa-f]{2}(?::[0-9A-Fa-f]{2}){5})'), str), 'chanspec' : (re.compile(r'Chanspec:\s*(.*?)\s*$', re.MULTILINE), str), \
+           'primary_channel' : (re.compile(r'Primary channel:\s*(\d+)'), int)}
+
+def parse_status(text) :
+    record = {}
+    for name, (regex, kind) in _status.items() :
+        m = regex.search(text)
+        if m :
+            record[name] = kind(m.group(1))
+    return record
+
+def parse_wme_ac(text) :
+    # per access category parameters, e.g. {'AC_BE' : {'aifsn' : 3, 'ecwmin' : 4, ...}, ...}
+    record = {}
+    parts = re.split(r'\b(AC_[A-Z]{2})\b', text)
+    for ac, body in zip(parts[1::2], parts[2::2]) :
+        record[ac] = {name.lower() : value for name, value in _integers(key_values(body)).items()}
+    return record
+
+# keyed by the wl/dhd sub command, 'dump ampdu' also matches e.g. 'dump ampdu -v'
+parsers = collections.OrderedDict([('dump ampdu', parse_ampdu), ('counters', parse_counters), ('status', parse_status), ('wme_ac', parse_wme_ac)])
+
+def parser_for(cmd) :
+    cmd = ' '.join(cmd.split())
+    for name, parser in parsers.items() :
+        if cmd == name or cmd.startswith(name + ' ') :
+            return parser
+    return None
+
+def histogram(counts, name, first_bin=0) :
+    # flow_histogram of a dump histogram, bins are bin indices with a bin width of 1
+    from flows import flow_histogram
+    counts = np.asarray(counts, dtype=np.int64)
+    bins = np.flatnonzero(counts)
+    if not len(bins) :
+        return None
+    return flow_histogram(name=name, bins=bins + first_bin, counts=counts[bins], binwidth=1)
+
+def histograms(record, prefix=None) :
+    result = {}
+    for label, counts in record.get('histograms', {}).items() :
+        name = '{}_{}'.format(prefix, label) if prefix else label
+        h = histogram(counts, name, first_bin=histogram_first_bin(label))
+        if h is not None :
+            result[label] = h
+    return result
+
+# Per run device deltas for a set of DUTs, before and after are {dut name : {cmd : record}}, e.g. from
+# ssh_node.wl_snapshot(). Counters are stacked into a duts x counters matrix and subtracted at once,
+# a negative difference is taken as a 32 bit counter wrap. dump ampdu is read after a dump_clear so
+# its histograms are already per run, they're stacked to duts x bins and the mean AMPDU length,
+# i.e. the aggregation efficiency, is computed for all DUTs in one go.
+device_run = collections.namedtuple('device_run', ['duts', 'counter_names', 'counter_deltas', 'histogram_names', 'histograms', 'mpdu_per_ampdu', 'records'])
+
+COUNTER_WRAP = 2 ** 32
+
+def arrays(run) :
+    # a device_run as named arrays, e.g. for histogram_archive.store(), the raw records are left out
+    result = {'duts' : np.array(run.duts, dtype=str), 'counter_names' : np.array(run.counter_names, dtype=str), \
+              'counter_deltas' : run.counter_deltas, 'histogram_names' : np.array(run.histogram_names, dtype=str), 'mpdu_per_ampdu' : run.mpdu_per_ampdu}
+    for name in run.histogram_names :
+        result['histogram_{}'.format(name)] = run.histograms[name]
+    return result
+
+def _stack(rows, width=None) :
+    width = width or max([len(row) for row in rows] + [0])
+    matrix = np.zeros((len(rows), width), dtype=np.int64)
+    for ix, row in enumerate(rows) :
+        matrix[ix, :len(row)] = row
+    return matrix
+
+def device_deltas(before, after, counters_cmd='counters', ampdu_cmd='dump ampdu', density='tx_mpdudens') :
+    duts = [dut for dut in after if dut in before]
+    old = [before[dut].get(counters_cmd) or {} for dut in duts]
+    new = [after[dut].get(counters_cmd) or {} for dut in duts]
+    names = sorted(set().union(*[set(o) & set(n) for o, n in zip(old, new)])) if duts else []
+    names = [name for name in names if all(isinstance(n.get(name, 0), int) for n in new)]
+    b = np.array([[o.get(name, np.nan) for name in names] for o in old], dtype=np.float64).reshape(len(duts), len(names))
+    a = np.array([[n.get(name, np.nan) for name in names] for n in new], dtype=np.float64).reshape(len(duts), len(names))
+    deltas = a - b
+    deltas = np.where(deltas < 0, deltas + COUNTER_WRAP, deltas)
+
+    ampdu = [(after[dut].get(ampdu_cmd) or {}).get('histograms', {}) for dut in duts]
+    histogram_names = sorted(set().union(*[set(h) for h in ampdu])) if duts else []
+    stacked = {name : _stack([h.get(name, []) for h in ampdu]) for name in histogram_names}
+    mpdu_per_ampdu = np.full(len(duts), np.nan)
+    if density not in stacked :
+        density = next((name for name in histogram_names if 'dens' in name), None)
+    if density :
+        matrix = stacked[density]
+        lengths = np.arange(matrix.shape[1]) + histogram_first_bin(density)
+        ampdus = matrix.sum(axis=1)
+        mpdu_per_ampdu = np.divide((matrix * lengths).sum(axis=1), ampdus, out=np.full(len(duts), np.nan), where=ampdus > 0)
+    return device_run(duts, names, deltas, histogram_names, stacked, mpdu_per_ampdu, {dut : after[dut] for dut in duts})